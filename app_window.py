@@ -2,6 +2,7 @@
 
 import abc
 
+import graphic
 import window
 import gui
 
@@ -38,6 +39,20 @@ class AppWindow(window.Window):
         """
         pass
 
+    def update_sources(self):
+        """Called when pools or datasets were loaded or changed
+
+        Window must be resized after update.
+        """
+
+    def draw_damaged(self):
+        """Draw window, elements whose sources didn't change are not drawn again"""
+        graphic.Damageable.partial_redraw = True
+        try:
+            self.draw()
+        finally:
+            graphic.Damageable.partial_redraw = False
+
     def register_element(self, element):
         """Register tab scrollable element"""
         self.selectable_elements.append(element)
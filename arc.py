@@ -1,8 +1,6 @@
 """Module for loading arc statistics"""
 
-import threading
 import time
-import datetime
 import re
 
 import arc_history
@@ -11,24 +9,17 @@ import arc_history
 class Arc:
     """Class representing arc cache"""
 
-    def __init__(self):
+    def __init__(self, loop):
         self.arc_history = arc_history.ArcHistory()
         self.stats = {}
-        self.init_arc_stats()
+        self.init_arc_stats(loop)
 
-    def init_arc_stats(self):
-        """Start thread to load arc stats"""
-        threading.Thread(target=self.arc_stats_loop, daemon=True, name="ArcStat").start()
-
-    def arc_stats_loop(self):
-        """Loop to periodicaly load stats"""
+    def init_arc_stats(self, loop):
+        """Periodicaly load arc stats in collector loop"""
         self.stats["hits_total"] = 0
         self.stats["miss_total"] = 0
         # read arc stats after zfs_viewer init completed
-        time.sleep(1)
-        while True:
-            self.load_stats()
-            time.sleep(arc_history.COLLECT_INTERVAL_SEC)
+        loop.add_timer(arc_history.COLLECT_INTERVAL_SEC, self.load_stats, delay=1, name="arc")
 
     def load_stats(self):
         """Open arcstats and load statistics"""
@@ -54,9 +45,7 @@ class Arc:
                 self.stats["miss_total"] = self.stats["misses"]
                 self.stats["hits"] = hits
                 self.stats["misses"] = miss
-                self.stats["time"] = datetime.datetime.fromtimestamp(int(time.time())).strftime(
-                    "%H:%M:%S"
-                )
+                self.stats["time"] = int(time.time())
                 try:
                     self.stats["hitrate"] = round(
                         100
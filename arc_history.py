@@ -1,6 +1,7 @@
 """Module for saving history stats"""
 
-from collections import deque
+import history_store
+import time_series
 import utils
 
 EXPORTED_DATA = ["hits", "misses", "io_total", "size", "mru_size", "mfu_size", "hitrate"]
@@ -12,39 +13,39 @@ COLLECT_INTERVAL_SEC = 1
 MAX_RECORDS = MAX_COLLECTED_TIME // COLLECT_INTERVAL_SEC
 
 CONVERT_MAP = {
+    "time": utils.convert_timestamp,
     "hitrate": utils.add_percent,
     "size": utils.convert_size,
     "mru_size": utils.convert_size,
     "mfu_size": utils.convert_size,
 }
 
+
+def series(param, series_class=time_series.RollupSeries, typecode="q"):
+    """Create arc history series"""
+    return series_class(MAX_RECORDS, typecode, "arc." + param, COLLECT_INTERVAL_SEC)
+
+
 # pylint: disable=too-few-public-methods
 class ArcHistory:
     """Class saving arcstats"""
 
+    # series are created once, state sharing encodes object only once
+    version = 0
+
     def __init__(self):
         self.stats = {}
-        self.graph1_data = deque(maxlen=MAX_RECORDS)
-        self.graph2_data = deque(maxlen=MAX_RECORDS)
-        for param in ["time"] + EXPORTED_DATA:
-            init_list = [-1] * MAX_RECORDS
-            self.stats[param] = deque(init_list, maxlen=MAX_RECORDS)
-
-        init_list = []
-        for _ in range(0, MAX_RECORDS):
-            node = []
-            for param in GRAPH_1 + ["other_size"]:
-                node.append(-1)
-            init_list.append(node)
-        self.graph1_data = deque(init_list, maxlen=MAX_RECORDS)
-
-        init_list = []
-        for _ in range(0, MAX_RECORDS):
-            node = []
-            for param in GRAPH_2:
-                node.append(-1)
-            init_list.append(node)
-        self.graph2_data = deque(init_list, maxlen=MAX_RECORDS)
+        with history_store.group("arc"):
+            self.stats["time"] = series("time", time_series.TimeSeries)
+            for param in EXPORTED_DATA:
+                self.stats[param] = series(param)
+            self.stats["hitrate"] = series("hitrate", typecode="d")
+            self.graph1_data = time_series.TimeSeriesGroup(
+                [series("graph1." + param) for param in GRAPH_1 + ["other_size"]]
+            )
+            self.graph2_data = time_series.TimeSeriesGroup(
+                [series("graph2." + param) for param in GRAPH_2]
+            )
 
     def add_node(self, stat):
         """Add new stats to history queue"""
@@ -71,7 +71,7 @@ class ArcIOWindow(app_window.AppWindow):
         self.time_graph = time_graph.TimeGraph(
             row + 12, col + 1, rows - 13, cols - 2, self.zfs.arc.arc_history.stats["hits"]
         )
-        self.time_graph.enable_x_scale(1, utils.add_second)
+        self.time_graph.enable_x_scale(1, utils.convert_time_s)
         self.arc_io_win = ArcIOSmallWindow(row + 1, col + 1, 9, cols - 2, self.zfs)
         self.time_graph_menu = graphic.HorizontalMenu(
             arc_history.EXPORTED_DATA, row + 10, col + 1, br=curses.ACS_BTEE, bl=curses.ACS_LTEE
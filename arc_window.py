@@ -52,7 +52,7 @@ class ArcWindow(app_window.AppWindow):
         self.arc_time_graph = time_graph.TimeGraphMulti(
             6, col + 2 + 40, rows - 7 - 2, cols - 2 - 41, zfs.arc.arc_history.graph1_data
         )
-        self.arc_time_graph.enable_x_scale(1, utils.add_second)
+        self.arc_time_graph.enable_x_scale(1, utils.convert_time_s)
         self.time_graph_menu = graphic.HorizontalMenu(
             ["ARC by cache", "ARC by type"], 4, col + 2 + 40, br=curses.ACS_BTEE, bl=curses.ACS_LTEE
         )
@@ -154,6 +154,10 @@ class ArcWindow(app_window.AppWindow):
         if chr(char) == "l":
             self.time_graph_menu.move_right()
             self.arc_time_graph.change_source(self.map_menu_to_graph())
+        if chr(char) == "+":
+            self.arc_time_graph.zoom_in()
+        if chr(char) == "-":
+            self.arc_time_graph.zoom_out()
         self.draw()
 
 
@@ -0,0 +1,342 @@
+"""Module with asyncio event loop running all collectors
+
+One thread runs asyncio loop with coroutines of all collectors. Periodic
+kstat readers are timers ticking on wall clock boundaries of their interval,
+so samples of all collectors are taken at the same time and collectors with
+the same interval read in the same tick. Jitter, run time and overruns of
+every timer are recorded in TickStats. Output of long running processes is
+passed to handlers line by line as soon as it arrives, one-shot commands
+pass their output to callback when they finish. Failures of callbacks are
+counted in TickStats of timer or process, other collectors keep running.
+
+Loop notifies UI about new data through bounded queue, notifications are
+coalesced when UI doesn't keep up, so collectors never wait for UI.
+"""
+
+import asyncio
+import math
+import queue
+import subprocess
+import threading
+import time
+
+IDLE_DELAY_SEC = 0.2
+RESTART_DELAY_SEC = 5
+UPDATE_QUEUE_SIZE = 1
+LINE_LIMIT = 1024 * 1024
+
+
+class UpdateQueue:
+    """Bounded queue telling UI about new data
+
+    Producer never blocks, notification is dropped when UI was not told about
+    previous data yet.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue(UPDATE_QUEUE_SIZE)
+
+    def notify(self):
+        """Tell UI that there is new data"""
+        try:
+            self.queue.put_nowait(True)
+        except queue.Full:
+            pass
+
+    def has_updates(self):
+        """Return True if there is new data since previous call"""
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            return False
+        return True
+
+
+# pylint: disable=too-many-instance-attributes
+class TickStats:
+    """Timing of periodic collector
+
+    jitter is delay of tick after its wall clock boundary, duration is run
+    time of collector, overruns counts ticks skipped because collector was
+    still running. Times are in seconds. failures counts callbacks which
+    raised exception, last_error describes the last one.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.ticks = 0
+        self.overruns = 0
+        self.jitter = 0
+        self.max_jitter = 0
+        self.total_jitter = 0
+        self.duration = 0
+        self.max_duration = 0
+        self.failures = 0
+        self.last_error = None
+
+    def fail(self, error):
+        """Record failed callback, return True if error differs from previous one"""
+        self.failures += 1
+        message = type(error).__name__ + ": " + str(error)
+        changed = message != self.last_error
+        self.last_error = message
+        return changed
+
+    def record(self, jitter, duration, missed):
+        """Record timing of one tick"""
+        self.ticks += 1
+        self.overruns += missed
+        self.jitter = jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.total_jitter += jitter
+        self.duration = duration
+        self.max_duration = max(self.max_duration, duration)
+
+    def mean_jitter(self):
+        """Return average jitter of all ticks"""
+        if self.ticks == 0:
+            return 0
+        return self.total_jitter / self.ticks
+
+
+class Timer:
+    """Periodic callback of loop"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, interval, callback, delay, name, stats):
+        self.interval = interval
+        self.callback = callback
+        self.delay = delay
+        self.name = name
+        self.stats = stats
+        self.cancelled = False
+
+    def cancel(self):
+        """Don't call callback anymore"""
+        self.cancelled = True
+
+
+# pylint: disable=too-many-instance-attributes
+class LineProcess:
+    """Long running process with output passed to handler line by line
+
+    idle_handler is called when process stops writing for a while, usually
+    after every block of output.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, args, line_handler, idle_handler, env, preexec_fn, name):
+        self.args = args
+        self.line_handler = line_handler
+        self.idle_handler = idle_handler
+        self.env = env
+        self.preexec_fn = preexec_fn
+        self.name = name
+        self.stats = TickStats(0)
+        self.child = None
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop process and don't start it again, runs in loop thread"""
+        self.cancelled = True
+        if self.child is not None and self.child.returncode is None:
+            self.child.kill()
+
+    async def start(self):
+        """Start process with output pipe"""
+        # pylint: disable=subprocess-popen-preexec-fn
+        return await asyncio.create_subprocess_exec(
+            *self.args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self.env,
+            preexec_fn=self.preexec_fn,
+            limit=LINE_LIMIT,
+        )
+
+
+class CollectorLoop:
+    """Event loop of collectors
+
+    Methods can be called from any thread, callbacks run in loop thread.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.updates = UpdateQueue()
+        self.tasks = set()
+        # timing and failures of timers and processes by name
+        self.tick_stats = {}
+        # function passed description of new collector failure
+        self.report = None
+
+    def start(self):
+        """Run loop in new thread"""
+        threading.Thread(target=self.loop.run_forever, daemon=True, name="CollectorLoop").start()
+
+    def run_callback(self, callback, *args, stats=None):
+        """Run callback, failure of one collector must not stop the others
+
+        Failure is recorded in stats of collector and new errors are reported.
+        """
+        try:
+            callback(*args)
+        # pylint: disable=broad-except
+        except Exception as error:
+            if stats is None:
+                stats = self.tick_stats.setdefault("other", TickStats(0))
+            if stats.fail(error) and self.report is not None:
+                name = getattr(callback, "__qualname__", "collector")
+                self.report(name + " failed: " + stats.last_error)
+            return
+        self.updates.notify()
+
+    def cancel(self, handle):
+        """Stop timer or process of removed object, forget its stats"""
+        if self.tick_stats.get(handle.name) is handle.stats:
+            del self.tick_stats[handle.name]
+        self.loop.call_soon_threadsafe(handle.cancel)
+
+    def spawn(self, coroutine):
+        """Run coroutine in loop"""
+        self.loop.call_soon_threadsafe(self.create_task, coroutine)
+
+    def create_task(self, coroutine):
+        """Create task and keep reference until it is done"""
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def call_soon(self, callback):
+        """Run callback in loop thread"""
+        self.loop.call_soon_threadsafe(self.run_callback, callback)
+
+    def add_timer(self, interval, callback, delay=0, name=None):
+        """Call callback every interval seconds, first call after delay
+
+        Timing is recorded in tick_stats under name.
+        """
+        stats = TickStats(interval)
+        name = name or callback.__qualname__
+        self.tick_stats[name] = stats
+        timer = Timer(interval, callback, delay, name, stats)
+        self.spawn(self.run_timer(timer))
+        return timer
+
+    async def run_timer(self, timer):
+        """Call callback of timer on wall clock boundaries until it is cancelled"""
+        tick = math.ceil((time.time() + timer.delay) / timer.interval)
+        while True:
+            scheduled = tick * timer.interval
+            await sleep_until(scheduled)
+            if timer.cancelled:
+                return
+            start = time.time()
+            self.run_callback(timer.callback, stats=timer.stats)
+            end = time.time()
+            # skip ticks missed by slow callback
+            next_tick = max(tick + 1, math.ceil(end / timer.interval))
+            timer.stats.record(start - scheduled, end - start, next_tick - tick - 1)
+            tick = next_tick
+
+    # pylint: disable=too-many-arguments
+    def add_process(
+        self,
+        args,
+        line_handler,
+        idle_handler=None,
+        env=None,
+        preexec_fn=None,
+        align=None,
+        name=None,
+    ):
+        """Start long running process and pass its output to handlers
+
+        Process is started again when it exits. If align is set, process is
+        started on wall clock boundary of align seconds, so periodic output
+        is in phase with timers of the same interval. Failures of handlers
+        are recorded in tick_stats under name.
+        """
+        name = name or " ".join(args[0:2])
+        process = LineProcess(args, line_handler, idle_handler, env, preexec_fn, name)
+        self.tick_stats[name] = process.stats
+        self.spawn(self.run_process(process, align))
+        return process
+
+    async def run_process(self, process, align):
+        """Read output of process, restart it when it exits"""
+        while not process.cancelled:
+            if align is not None:
+                await sleep_until(math.ceil(time.time() / align) * align)
+            if process.cancelled:
+                return
+            try:
+                process.child = await process.start()
+            except OSError:
+                await asyncio.sleep(RESTART_DELAY_SEC)
+                continue
+            await self.read_lines(process, process.child.stdout)
+            await process.child.wait()
+            await asyncio.sleep(RESTART_DELAY_SEC)
+
+    async def read_lines(self, process, stream):
+        """Pass lines of stream to handlers until end of stream"""
+        pending = False
+        while True:
+            try:
+                if pending:
+                    line = await asyncio.wait_for(stream.readline(), IDLE_DELAY_SEC)
+                else:
+                    line = await stream.readline()
+            except asyncio.TimeoutError:
+                pending = False
+                self.run_callback(process.idle_handler, stats=process.stats)
+                continue
+            except ValueError:
+                # line longer than limit is dropped
+                continue
+            if not line:
+                if pending:
+                    self.run_callback(process.idle_handler, stats=process.stats)
+                return
+            if process.cancelled:
+                return
+            self.run_callback(
+                process.line_handler, line.decode("utf-8", errors="replace"), stats=process.stats
+            )
+            pending = process.idle_handler is not None
+
+    def run_command(self, args, callback, env=None):
+        """Run one-shot command, pass return code, stdout and stderr to callback"""
+        self.spawn(self.command(args, callback, env))
+
+    async def command(self, args, callback, env):
+        """Run command and wait for its output"""
+        try:
+            child = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+            )
+        except OSError as error:
+            self.run_callback(callback, -1, "", str(error))
+            return
+        stdout, stderr = await child.communicate()
+        self.run_callback(
+            callback,
+            child.returncode,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
+
+
+async def sleep_until(timestamp):
+    """Sleep until wall clock time, never wake up before it"""
+    while True:
+        delay = timestamp - time.time()
+        if delay <= 0:
+            return
+        await asyncio.sleep(delay)
@@ -1,6 +1,7 @@
 """Module saving dataset IO stats"""
 
-from collections import deque
+import history_store
+import time_series
 
 MAX_COLLECTED_TIME = 3600
 IO_STATS = ["c_total", "reads", "writes", "nread", "b_total", "nwritten", "nunlinks", "nunlinked"]
@@ -11,13 +12,22 @@ MAX_RECORDS = MAX_COLLECTED_TIME // COLLECT_INTERVAL_SEC
 class DatasetIOHistory:
     """Class representing dataset io history"""
 
-    def __init__(self):
+    # series are created once, state sharing encodes object only once
+    version = 0
+
+    def __init__(self, dataset_name, interval=COLLECT_INTERVAL_SEC):
         self.stats = {}
-        for param in IO_STATS:
-            init_list = [-1] * MAX_RECORDS
-            self.stats[param] = deque(init_list, maxlen=MAX_RECORDS)
+        prefix = "dataset." + dataset_name + "."
+        # one segment of history store for all series of dataset
+        with history_store.group("dataset." + dataset_name):
+            self.stats["time"] = time_series.TimeSeries(MAX_RECORDS, "q", prefix + "time", interval)
+            for param in IO_STATS:
+                self.stats[param] = time_series.RollupSeries(
+                    MAX_RECORDS, "q", prefix + param, interval
+                )
 
-    def add_node(self, stat):
+    def add_node(self, stat, timestamp):
         """Add new record"""
+        self.stats["time"].append(timestamp)
         for param in IO_STATS:
             self.stats[param].append(stat[param])
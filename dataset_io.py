@@ -1,6 +1,6 @@
 """Class for reading dataset IO"""
 
-import threading
+import os
 import time
 
 import dataset_history
@@ -22,61 +22,88 @@ COLLECT_INTERVAL_SEC = 5
 class DatasetIO:
     """Class representing IO for one dataset"""
 
-    def __init__(self, pool_name, objsetid):
+    def __init__(self, pool_name, objsetid, dataset_name):
         self.pool_name = pool_name
         self.objsetid = objsetid
         self.stats = {}
         self.stats_old = {}
         self.abs_stats = {}
         self.valid = -1
+        # increased on every change, state sharing encodes only changed objects
+        self.version = 0
         for param in IO_STATS:
             self.abs_stats[param] = 0
 
-        self.history = dataset_history.DatasetIOHistory()
-        self.init_dataset_io_watcher()
+        self.history = dataset_history.DatasetIOHistory(dataset_name, COLLECT_INTERVAL_SEC)
 
-    def init_dataset_io_watcher(self):
-        """Run thread to start reading dataset_io"""
-        threading.Thread(
-            target=self.dataset_io_watcher, daemon=True, name="DatasetIOWatcher"
-        ).start()
+    def read_stats(self, dataset_io, timestamp):
+        """Read stats for dataset from opened objset kstat file"""
+        dataset_io.readline()
+        dataset_io.readline()
+        while True:
+            self.stats_old = self.stats
+            line = dataset_io.readline()
+            if line:
+                name = line.split()[0]
+                if name != "dataset_name":
+                    value = int(line.split()[2])
+                    self.stats[name] = value - self.abs_stats[name]
+                    self.abs_stats[name] = value
+            else:
+                break
+        self.stats["c_total"] = self.stats["reads"] + self.stats["writes"]
+        self.stats["b_total"] = self.stats["nread"] + self.stats["nwritten"]
+        self.stats["del_queue"] = self.abs_stats["nunlinks"] - self.abs_stats["nunlinked"]
+        if self.valid < 1:
+            self.valid += 1
+        else:
+            self.history.add_node(self.stats, timestamp)
+        self.version += 1
 
-    def read_stats(self):
-        """Read stats for dataset"""
-        file_name = (
-            "/proc/spl/kstat/zfs/" + self.pool_name + "/objset-" + str(hex(int(self.objsetid)))
+    def invalidate(self):
+        """Mark stats as not collected, dataset has no kstat"""
+        if self.valid != 0:
+            self.valid = 0
+            self.version += 1
+
+
+class PoolDatasetIO:
+    """Class collecting IO of all pool datasets in one timer
+
+    All objset kstats of pool are read in the same tick, so samples
+    of all datasets share one timestamp.
+    """
+
+    def __init__(self, pool_name, objset_index, loop):
+        self.pool_name = pool_name
+        self.objset_index = objset_index
+        self.last_timestamp = 0
+        self.timer = loop.add_timer(
+            COLLECT_INTERVAL_SEC, self.read_stats, name=pool_name + " datasets"
         )
+
+    def read_stats(self):
+        """Read stats for all datasets of pool"""
+        directory = "/proc/spl/kstat/zfs/" + self.pool_name
+        dataset_map = dict(self.objset_index)
+        timestamp = int(time.time())
         try:
-            with open(file_name, "r", encoding="utf8") as dataset_io:
-                dataset_io.readline()
-                dataset_io.readline()
-                while True:
-                    self.stats_old = self.stats
-                    line = dataset_io.readline()
-                    if line:
-                        name = line.split()[0]
-                        if name != "dataset_name":
-                            value = int(line.split()[2])
-                            self.stats[name] = value - self.abs_stats[name]
-                            self.abs_stats[name] = value
-                    else:
-                        break
-                self.stats["c_total"] = self.stats["reads"] + self.stats["writes"]
-                self.stats["b_total"] = self.stats["nread"] + self.stats["nwritten"]
-                self.stats["del_queue"] = self.abs_stats["nunlinks"] - self.abs_stats["nunlinked"]
-                if self.valid < 1:
-                    self.valid += 1
-                else:
-                    self.history.add_node(self.stats)
+            files = os.listdir(directory)
         except FileNotFoundError:
-            self.valid = 0
-            time.sleep(COLLECT_INTERVAL_SEC * 10)
-            return
-
-    def dataset_io_watcher(self):
-        """Periodicaly read stats for dataset"""
-        self.read_stats()
-        time.sleep(COLLECT_INTERVAL_SEC)
-        while True:
-            self.read_stats()
-            time.sleep(COLLECT_INTERVAL_SEC)
+            files = []
+        for file_name in files:
+            if not file_name.startswith("objset-"):
+                continue
+            try:
+                dataset_io = dataset_map.pop(file_name[len("objset-") :]).io
+            except KeyError:
+                continue
+            try:
+                with open(directory + "/" + file_name, "r", encoding="utf8") as kstat_file:
+                    dataset_io.read_stats(kstat_file, timestamp)
+            except FileNotFoundError:
+                dataset_io.invalidate()
+        # datasets without kstat (unmounted)
+        for dataset in dataset_map.values():
+            dataset.io.invalidate()
+        self.last_timestamp = timestamp
@@ -21,12 +21,7 @@ class DatasetIOWindow(app_window.AppWindow):
         rows, cols = self.window.getmaxyx()
         row, col = self.window.getbegyx()
 
-        datasets = []
-        for pool in self.zfs.zpools.values():
-            for dataset in pool.datasets.values():
-                if dataset.property["mounted"] == "yes":
-                    datasets += [dataset.name]
-
+        datasets = self.mounted_datasets()
         self.dataset_menu = graphic.VerticalMenu(datasets, row + 1, col + 1, 0, 0, cols // 4)
         self.dataset_io_pad = DatasetIOPad(
             row + 1,
@@ -66,6 +61,27 @@ class DatasetIOWindow(app_window.AppWindow):
         self.set_correct_covert_funct()
         self.draw()
 
+    def mounted_datasets(self):
+        """Return names of mounted datasets, root dataset of pool until it is loaded"""
+        datasets = []
+        for pool in list(self.zfs.zpools.values()):
+            for dataset in list(pool.datasets.values()):
+                if dataset.property["mounted"] == "yes" or not pool.loaded:
+                    datasets += [dataset.name]
+        return datasets
+
+    def update_sources(self):
+        """Show loaded datasets"""
+        datasets = self.mounted_datasets()
+        if not datasets:
+            return
+        self.dataset_menu.update_menu(datasets)
+        self.time_graph.change_source(
+            self.zfs.dataset_by_name(self.dataset_menu.selected()).io.history.stats[
+                self.time_graph_menu.selected()
+            ]
+        )
+
     def set_correct_covert_funct(self):
         """What function to use to convert values"""
         try:
@@ -103,11 +119,10 @@ class DatasetIOWindow(app_window.AppWindow):
         self.refresh()
 
     def rescan(self):
-        """Rescan"""
-        # todo: ?
-        del self.dataset_menu
+        """Rescan datasets and show changes"""
         self.zfs.rescan_datasets()
-        self.dataset_menu = graphic.VerticalMenu(self.window, self.zfs.get_datasets(), 4, 2, 1)
+        self.update_sources()
+        self.resize(0, 0, 0, 0)
 
     def _draw(self):
         self.window.border()
@@ -150,16 +165,25 @@ class DatasetIOWindow(app_window.AppWindow):
                     self.time_graph_menu.selected()
                 ]
             )
+        if chr(char) == "+":
+            self.time_graph.zoom_in()
+        if chr(char) == "-":
+            self.time_graph.zoom_out()
         self.draw()
 
 
-class DatasetIOPad(scroll_pad.ScrollPad):
+class DatasetIOPad(scroll_pad.ListPad):
     """Dataset IO subwindow"""
 
+    header_rows = 2
+
     def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, zfs, Menu):
         self.menu = Menu
         self.zfs = zfs
-        super().__init__(s_r, s_c, size_r, size_c, w_size_r, w_size_c, True)
+        self.shift = 8
+        self.block_separator = 0
+        self.datasets = []
+        super().__init__(s_r, s_c, size_c, w_size_r, w_size_c)
         self.draw()
 
     def print_header(self, row, col, shift, block_separator):
@@ -181,67 +205,68 @@ class DatasetIOPad(scroll_pad.ScrollPad):
         self.window.addstr(row + 1, col + shift * 7 + 2 * block_separator, "fin_del")
         self.window.addstr(row + 1, col + shift * 8 + 2 * block_separator, "del_queue")
 
-    # pylint: disable=too-many-branches,too-many-nested-blocks
-    def _draw(self):
-        self.window.erase()
+    def row_count(self):
+        datasets = []
+        for pool in list(self.zfs.zpools.values()):
+            datasets += list(pool.datasets.values())
+        # datasets without IO stats are shown only when all datasets fit
+        if (self.w_size_r - 2) < len(datasets):
+            datasets = [dataset for dataset in datasets if dataset.io.valid == 1]
+        self.datasets = datasets
+        return len(datasets)
+
+    def draw_header(self):
+        """Set columns by window width and print header"""
         self.border_window.attrset(curses.color_pair(graphic.COLOR_OK))
         self.border_window.border()
         self.border_window.attrset(curses.color_pair(0))
 
-        shift = 8
-        block_separator = 0
-
-        if self.w_size_c > 44 + shift * (9 + 2):
-            block_separator = shift
-
-        self.print_header(0, 40, shift, block_separator)
-
-        print_grey = True
-        if (self.w_size_r - 2) < len(self.zfs.get_datasets()):
-            print_grey = False
-
-        i = 2
-        for pool in self.zfs.zpools.values():
-            for dataset in pool.datasets.values():
-                if dataset.io.valid == 1:
-                    if self.menu.selected() == dataset.name:
-                        attr = curses.color_pair(graphic.COLOR_OK)
-                    else:
-                        attr = curses.A_NORMAL
-                    self.add_line(i, 1, dataset.name, attr)
-                    j = 0
-                    for key in ["reads", "writes", "c_total"]:
-                        self.add_line(
-                            i, 40 + shift * j, utils.convert_count(dataset.io.stats[key]), attr
-                        )
-                        j += 1
-                    for key in ["nread", "nwritten", "b_total"]:
-                        self.add_line(
-                            i,
-                            40 + shift * j + block_separator * 1,
-                            utils.convert_size(dataset.io.stats[key]),
-                            attr,
-                        )
-                        j += 1
-                    for key in ["nunlinks", "nunlinked", "del_queue"]:
-                        self.add_line(
-                            i,
-                            40 + shift * j + block_separator * 2,
-                            utils.convert_count(dataset.io.stats[key]),
-                            attr,
-                        )
-                        j += 1
-                    i += 1
-                else:
-                    if print_grey:
-                        self.add_line(i, 1, dataset.name, curses.A_DIM)
-                        j = 0
-                        separator = 0
-                        for key in dataset_io.IO_STATS:
-                            if j > 2:
-                                separator = block_separator
-                            if j > 5:
-                                separator = 2 * block_separator
-                            self.add_line(i, 40 + shift * j + separator, "-", curses.A_DIM)
-                            j += 1
-                        i += 1
+        self.block_separator = 0
+        if self.w_size_c > 44 + self.shift * (9 + 2):
+            self.block_separator = self.shift
+
+        self.print_header(0, 40, self.shift, self.block_separator)
+
+    def draw_row(self, row, index):
+        dataset = self.datasets[index]
+        shift = self.shift
+        block_separator = self.block_separator
+        if dataset.io.valid != 1:
+            self.add_line(row, 1, dataset.name, curses.A_DIM)
+            j = 0
+            separator = 0
+            for key in dataset_io.IO_STATS:
+                if j > 2:
+                    separator = block_separator
+                if j > 5:
+                    separator = 2 * block_separator
+                self.add_line(row, 40 + shift * j + separator, "-", curses.A_DIM)
+                j += 1
+            return 1
+
+        if self.menu.selected() == dataset.name:
+            attr = curses.color_pair(graphic.COLOR_OK)
+        else:
+            attr = curses.A_NORMAL
+        self.add_line(row, 1, dataset.name, attr)
+        j = 0
+        for key in ["reads", "writes", "c_total"]:
+            self.add_line(row, 40 + shift * j, utils.convert_count(dataset.io.stats[key]), attr)
+            j += 1
+        for key in ["nread", "nwritten", "b_total"]:
+            self.add_line(
+                row,
+                40 + shift * j + block_separator * 1,
+                utils.convert_size(dataset.io.stats[key]),
+                attr,
+            )
+            j += 1
+        for key in ["nunlinks", "nunlinked", "del_queue"]:
+            self.add_line(
+                row,
+                40 + shift * j + block_separator * 2,
+                utils.convert_count(dataset.io.stats[key]),
+                attr,
+            )
+            j += 1
+        return 1
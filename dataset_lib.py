@@ -2,54 +2,138 @@
 
 import subprocess
 
-import snapshot_lib
 import dataset_io
 
 
+PROPERTIES = [
+    "used",
+    "referenced",
+    "available",
+    "quota",
+    "refquota",
+    "usedbysnapshots",
+    "mountpoint",
+    "mounted",
+    "recordsize",
+    "compressratio",
+    "compression",
+    "atime",
+    "acltype",
+    "xattr",
+    "devices",
+    "exec",
+    "setuid",
+    "primarycache",
+    "secondarycache",
+    "sync",
+    "encryption",
+    "objsetid",
+    "usedbydataset",
+    "usedbychildren",
+    "usedbyrefreservation",
+]
+NUMERIC_PROPERTIES = [
+    "used",
+    "referenced",
+    "available",
+    "usedbysnapshots",
+    "objsetid",
+    "usedbydataset",
+    "usedbychildren",
+    "usedbyrefreservation",
+]
+
+
+def placeholder_properties():
+    """Return properties shown until dataset is loaded"""
+    return {key: "0" if key in NUMERIC_PROPERTIES else "loading" for key in PROPERTIES}
+
+
+def read_properties(names, recursive=True):
+    """Read properties of datasets and all their children with one zfs call
+
+    Return dictionary of property dictionaries by dataset name, in zfs order.
+    """
+    datasets = {}
+    with subprocess.Popen(
+        [
+            "zfs",
+            "get",
+            "-rHp" if recursive else "-Hp",
+            "-t",
+            "filesystem,volume",
+            "-o",
+            "name,property,value",
+            ",".join(PROPERTIES),
+        ]
+        + names,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ) as process:
+        for line in process.stdout:
+            fields = line.rstrip("\n").split("\t", 2)
+            if len(fields) < 3:
+                continue
+            try:
+                datasets[fields[0]][fields[1]] = fields[2]
+            except KeyError:
+                datasets[fields[0]] = {fields[1]: fields[2]}
+    # keep properties in same order as when read one by one
+    for dataset_name, row in datasets.items():
+        datasets[dataset_name] = {key: row[key] for key in PROPERTIES if key in row}
+    return datasets
+
+
+def list_datasets():
+    """List objsetids of all datasets with one zfs call
+
+    Return dictionary of {name: objsetid} dictionaries by pool name, datasets
+    are in zfs order. Return None if zfs fails.
+    """
+    try:
+        output = subprocess.run(
+            ["zfs", "list", "-Hpo", "name,objsetid", "-t", "filesystem,volume"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        return None
+    pools = {}
+    for line in output.stdout.splitlines():
+        name, objsetid = line.split("\t")[0:2]
+        pool_name = name.split("/")[0]
+        try:
+            pools[pool_name][name] = objsetid
+        except KeyError:
+            pools[pool_name] = {name: objsetid}
+    return pools
+
+
 class Dataset:
     """Class representing zfs dataset"""
 
-    def __init__(self, name):
+    def __init__(self, name, properties=None):
         self.name = name
+        # increased on every change, state sharing encodes only changed objects
+        self.version = 0
         self.parent_pool = name.split("/")[0]
-        self.get_properties()
-        self.snapshot = {}
-        self.has_holds = False
+        if properties is None:
+            self.get_properties()
+        else:
+            self.property = properties
         # pylint: disable=invalid-name
-        self.io = dataset_io.DatasetIO(self.parent_pool, self.property["objsetid"])
+        self.io = dataset_io.DatasetIO(
+            self.parent_pool, self.property["objsetid"], self.name
+        )
 
     def get_properties(self):
         """Read properties for dataset"""
-        properties = [
-            "used",
-            "referenced",
-            "available",
-            "quota",
-            "refquota",
-            "usedbysnapshots",
-            "mountpoint",
-            "mounted",
-            "recordsize",
-            "compressratio",
-            "compression",
-            "atime",
-            "acltype",
-            "xattr",
-            "devices",
-            "exec",
-            "setuid",
-            "primarycache",
-            "secondarycache",
-            "sync",
-            "encryption",
-            "objsetid",
-            "usedbydataset",
-            "usedbychildren",
-            "usedbyrefreservation",
-        ]
         try:
             output = subprocess.run(
-                ["zfs", "get", "-Hpo", "value", ",".join(properties), self.name],
+                ["zfs", "get", "-Hpo", "value", ",".join(PROPERTIES), self.name],
                 stdout=subprocess.PIPE,
                 text=True,
                 check=True,
@@ -59,28 +143,16 @@ class Dataset:
         i = 0
         self.property = {}
         for line in output.stdout.splitlines():
-            self.property[properties[i]] = line
+            self.property[PROPERTIES[i]] = line
             i += 1
 
-    def get_snapshot(self, name):
-        """Return snapshot by name"""
-        return self.snapshot[name]
+    def set_properties(self, properties):
+        """Replace placeholder properties by loaded ones, keep collected IO"""
+        self.property = properties
+        self.io.objsetid = properties["objsetid"]
+        self.version += 1
+        self.io.version += 1
 
-    def get_snapshots(self):
-        """Get snapshots for dataset"""
-        try:
-            output = subprocess.run(
-                ["zfs", "list", "-Hpo", "name,used,creation", "-t", "snapshot", self.name],
-                stdout=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-            if output.stdout != "":
-                for line in output.stdout.splitlines():
-                    data = line.split("\t")
-                    short_name = data[0].split("@")[1]
-                    self.snapshot[short_name] = snapshot_lib.Snapshot(
-                        self, data[0], data[1], data[2]
-                    )
-        except subprocess.CalledProcessError:
-            return
+    def objset_key(self):
+        """Return objsetid in hex format used by kstats (0x36)"""
+        return hex(int(self.property["objsetid"]))
@@ -91,6 +91,7 @@ class DatasetWindow(app_window.AppWindow):
             cols - 3 - self.dataset_menu.get_size()[1],
         )
 
+        self.graylist_source = None
         self.set_snapshot_menu_graylist()
         self.register_element(self.dataset_pad)
         self.register_element(self.snapshot_pad)
@@ -138,17 +139,25 @@ class DatasetWindow(app_window.AppWindow):
         self.draw()
         self.refresh()
 
+    def update_sources(self):
+        """Show loaded datasets"""
+        self.dataset_menu.update_menu(self.zfs.get_datasets())
+        self.usage_bar.prepare_data()
+        self.set_snapshot_menu_graylist()
+
     def rescan(self):
-        """rescan datasets"""
-        # todo: update menu
-        del self.dataset_menu
+        """Rescan datasets and show changes"""
         self.zfs.rescan_datasets()
-        self.dataset_menu = graphic.VerticalMenu(self.window, self.zfs.get_datasets(), 4, 2, 1)
+        self.zfs.forget_snapshots()
+        self.update_sources()
+        self.resize(0, 0, 0, 0)
 
     def _draw(self):
         self.window.border()
         self.window.noutrefresh()
         self.dataset_menu.draw()
+        # holds are known when snapshots of dataset are loaded
+        self.set_snapshot_menu_graylist()
         self.snapshot_pad.draw()
         self.usage_bar.draw()
         self.snapshot_menu.draw()
@@ -158,8 +167,13 @@ class DatasetWindow(app_window.AppWindow):
 
     def set_snapshot_menu_graylist(self):
         """If dataset has any holds on snapshots"""
-        dataset = self.zfs.dataset_by_name(self.dataset_menu.selected())
-        if dataset.has_holds:
+        name = self.dataset_menu.selected()
+        snapshots = self.zfs.snapshots(name)
+        if self.graylist_source == (name, id(snapshots)):
+            # holds of these snapshots were already checked
+            return
+        self.graylist_source = (name, id(snapshots))
+        if snapshots is not None and snapshots.has_holds():
             self.snapshot_menu.set_graylist("")
         else:
             self.snapshot_menu.set_graylist("Holds")
@@ -194,6 +208,11 @@ class DatasetPad(scroll_pad.ScrollPad):
         super().__init__(s_r, s_c, size_r, size_c, w_size_r, w_size_c, True)
         self.draw()
 
+    def damage_key(self):
+        """Properties are replaced when dataset is loaded or rescanned"""
+        dataset = self.zfs.dataset_by_name(self.menu.selected())
+        return (dataset, dataset.property)
+
     def _draw(self):
         self.window.erase()
         self.border_window.attrset(curses.color_pair(graphic.COLOR_OK))
@@ -241,85 +260,108 @@ class DatasetPad(scroll_pad.ScrollPad):
                 i += self.add_line(i, pad, dataset.property[dataset_property])
 
 
-class SnapshotPad(scroll_pad.ScrollPad):
-    """ScrollPad for snapshots"""
+class SnapshotPad(scroll_pad.ListPad):
+    """ScrollPad for snapshots
+
+    Rows are snapshots or holds by selected section. Holds are collected to
+    rows once for every loaded SnapshotTable.
+    """
+
+    header_rows = 1
 
     def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, zfs, Menu, Section_menu):
         self.menu = Menu
         self.section_menu = Section_menu
         self.zfs = zfs
-        super().__init__(s_r, s_c, size_r, size_c, w_size_r, w_size_c, True)
+        self.snapshots = None
+        self.name_len = 0
+        # (tag, row of snapshot, timestamp) of all holds
+        self.holds = []
+        self.holds_source = None
+        self.hold_name_len = 0
+        # width of snapshot column of holds, snapshot list has name_len
+        self.hold_snap_len = 0
+        super().__init__(s_r, s_c, size_c, w_size_r, w_size_c)
         self.draw()
 
-    # pylint: disable=too-many-branches
-    def _draw(self):
-        self.window.erase()
+    def damage_key(self):
+        """Snapshots change when their loading finishes"""
+        name = self.menu.selected()
+        return (name, self.zfs.snapshots(name), self.section_menu.selected())
+
+    def collect_holds(self, snapshots):
+        """Collect holds of snapshots to rows and widths of their columns"""
+        if self.holds_source is snapshots:
+            return
+        self.holds_source = snapshots
+        self.holds = []
+        hold_name_len = 0
+        snap_name_len = 0
+        for row, holds in sorted(snapshots.holds.items()):
+            for tag, hold in holds.items():
+                self.holds.append((tag, row, hold))
+                hold_name_len = max(hold_name_len, len(tag))
+                snap_name_len = max(snap_name_len, len(snapshots.names[row]))
+        self.hold_snap_len = min(snap_name_len, 6)
+        self.hold_name_len = min(hold_name_len, 6)
+
+    def row_count(self):
+        self.snapshots = self.zfs.snapshots(self.menu.selected())
+        if self.snapshots is None:
+            return 0
+        if self.section_menu.selected() == "Holds":
+            self.collect_holds(self.snapshots)
+            return len(self.holds)
+        return len(self.snapshots)
+
+    def draw_header(self):
+        """Draw border and header of selected section"""
         self.border_window.attrset(curses.color_pair(graphic.COLOR_OK))
         self.border_window.border()
         self.border_window.attrset(curses.color_pair(0))
 
-        dataset = self.zfs.dataset_by_name(self.menu.selected())
-
-        if self.section_menu.selected() == "Snapshots":
-            snap_name_len = 0
-
-            for key in dataset.snapshot:
-                if len(dataset.snapshot[key].short_name) > snap_name_len:
-                    snap_name_len = len(dataset.snapshot[key].short_name)
+        snapshots = self.snapshots
+        if snapshots is None:
+            self.window.addstr(0, 1, "Loading snapshots...", curses.A_BOLD)
+            return
 
-            if snap_name_len > self.w_size_c - 17 - 6 - 8:
-                snap_name_len = self.w_size_c - 17 - 6 - 8
-            else:
-                snap_name_len -= 2
-
-            snap_name_len = max(snap_name_len, 5)
+        if self.section_menu.selected() == "Holds":
+            self.window.addstr(0, 1, "name:", curses.A_BOLD)
+            self.window.addstr(0, self.hold_name_len + 4, "snap:", curses.A_BOLD)
+            self.window.addstr(
+                0, self.hold_name_len + self.hold_snap_len + 12, "time:", curses.A_BOLD
+            )
+            return
 
-            i = 0
-            self.window.addstr(i, 1, "name:", curses.A_BOLD)
-            self.window.addstr(i, 2 + snap_name_len, "time:", curses.A_BOLD)
-            self.window.addstr(i, 2 + snap_name_len + 19, "size:", curses.A_BOLD)
-            i += 1
+        snap_name_len = snapshots.max_name_length
+        if snap_name_len > self.w_size_c - 17 - 6 - 8:
+            snap_name_len = self.w_size_c - 17 - 6 - 8
+        else:
+            snap_name_len -= 2
+        self.name_len = max(snap_name_len, 5)
 
-            for key in dataset.snapshot:
-                if len(dataset.snapshot[key].short_name) > snap_name_len:
-                    self.add_line(
-                        i, 1, "@" + dataset.snapshot[key].short_name[0 : snap_name_len - 2]
-                    )
-                else:
-                    self.add_line(i, 1, "@" + dataset.snapshot[key].short_name)
-                self.window.addstr(i, 2 + snap_name_len, dataset.snapshot[key].creation_human)
-                self.window.addstr(
-                    i, 2 + snap_name_len + 19, utils.convert_size(dataset.snapshot[key].size)
-                )
-                i += 1
+        self.window.addstr(0, 1, "name:", curses.A_BOLD)
+        self.window.addstr(0, 2 + self.name_len, "time:", curses.A_BOLD)
+        self.window.addstr(0, 2 + self.name_len + 19, "size:", curses.A_BOLD)
 
+    def draw_row(self, row, index):
+        snapshots = self.snapshots
         if self.section_menu.selected() == "Holds":
-            hold_name_len = 0
-            snap_name_len = 0
-            for key in dataset.snapshot:
-                for key2 in dataset.snapshot[key].holds:
-                    if len(key2) > hold_name_len:
-                        hold_name_len = len(key2)
-                    if len(key) > snap_name_len:
-                        snap_name_len = len(key)
-
-            snap_name_len = min(snap_name_len, 6)
-            hold_name_len = min(hold_name_len, 6)
-
-            i = 0
-            self.window.addstr(i, 1, "name:", curses.A_BOLD)
-            self.window.addstr(i, hold_name_len + 4, "snap:", curses.A_BOLD)
-            self.window.addstr(i, hold_name_len + snap_name_len + 12, "time:", curses.A_BOLD)
-            i += 1
+            tag, snapshot, hold = self.holds[index]
+            self.window.addstr(row, 1, tag)
+            self.window.addstr(row, self.hold_name_len + 4, snapshots.names[snapshot])
+            self.window.addstr(
+                row,
+                self.hold_name_len + self.hold_snap_len + 12,
+                datetime.datetime.fromtimestamp(hold).strftime("%b %d %H:%M %Y"),
+            )
+            return 1
 
-            for key in dataset.snapshot:
-                for key2 in dataset.snapshot[key].holds:
-                    hold = dataset.snapshot[key].holds[key2]
-                    self.window.addstr(i, 1, key2)
-                    self.window.addstr(i, hold_name_len + 4, key)
-                    self.window.addstr(
-                        i,
-                        hold_name_len + snap_name_len + 12,
-                        datetime.datetime.fromtimestamp(hold).strftime("%b %d %H:%M %Y"),
-                    )
-                    i += 1
+        name = snapshots.names[index]
+        if len(name) > self.name_len:
+            self.add_line(row, 1, "@" + name[0 : self.name_len - 2])
+        else:
+            self.add_line(row, 1, "@" + name)
+        self.window.addstr(row, 2 + self.name_len, snapshots.creation_human(index))
+        self.window.addstr(row, 2 + self.name_len + 19, utils.convert_size(snapshots.used[index]))
+        return 1
@@ -1,14 +1,20 @@
 """Module for reading and storing eventlog"""
 
-import threading
-import subprocess
-import os
-import time
-import weakref
 import signal
 import ctypes
 from collections import deque
 
+# not important parameters, not needed to store
+FIELD_BLACKLIST = ["version", "history_hostname", "pool_guid", "history_time", "time"]
+
+
+def parse_eid(line):
+    """Return event id from eid row or None"""
+    try:
+        return int(line.split("=", 1)[1], 0)
+    except (IndexError, ValueError):
+        return None
+
 
 # pylint: disable=too-few-public-methods
 class EventRecord:
@@ -16,31 +22,50 @@ class EventRecord:
 
     def __init__(self):
         self.rows = []
+        # increased on every change, state sharing encodes only changed objects
+        self.version = 0
+        # event id, None until eid row is read
+        self.eid = None
 
     def add_row(self, row):
         """Add row to record"""
         self.rows.append(row)
+        self.version += 1
 
 
 class EventLog:
     """Class for event log"""
 
-    def __init__(self, name):
+    def __init__(self, name, loop):
         self.__pool_name = name
         self.logs = deque(maxlen=100)
-        self.__init_event_log()
+        # number of added records, tells UI that log changed
+        self.count = 0
+        # id of newest added event, events are printed again when process is restarted
+        self.last_eid = -1
+        self.record = EventRecord()
+        self.__init_event_log(loop)
 
-    def __init_event_log(self):
-        """Fork thread to stream event log"""
-        threading.Thread(
-            target=self.__event_log_loop, daemon=True, args=(weakref.ref(self),), name="EventLog"
-        ).start()
+    def __init_event_log(self, loop):
+        """Stream event log in collector loop"""
+        # pylint: disable=subprocess-popen-preexec-fn
+        self.process = loop.add_process(
+            ["zpool", "events", "-vf", self.__pool_name],
+            self.event_line,
+            preexec_fn=self.set_pdeathsig(signal.SIGTERM),
+            name=self.__pool_name + " events",
+        )
 
     def __add_record(self, record):
         """Add record to event log"""
+        if record.eid is not None:
+            if record.eid <= self.last_eid:
+                return
+            self.last_eid = record.eid
         if len(record.rows) > 0:
             record.add_row("\n")
             self.logs.appendleft(record)
+            self.count += 1
 
     # pylint: disable=no-self-use
     def set_pdeathsig(self, sig=signal.SIGTERM):
@@ -52,47 +77,24 @@ class EventLog:
 
         return kill_callable
 
-    def __event_log_loop(self, _):
-        # not important parameters, not needed to store
-        field_blacklist = ["version", "history_hostname", "pool_guid", "history_time", "time"]
-        # pylint: disable=subprocess-popen-preexec-fn
-        with (
-            subprocess.Popen(
-                ["zpool", "events", "-vf", self.__pool_name],
-                bufsize=1,
-                preexec_fn=self.set_pdeathsig(signal.SIGTERM),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                encoding="utf-8",
-                errors="replace",
-            )
-        ) as process:
-            os.set_blocking(process.stdout.fileno(), True)
-            # read and ignore header
-            process.stdout.readline()
-            record = EventRecord()
-            while True:
-                real_self = self
-                if real_self is None:
-                    break
-                del real_self
-                line = process.stdout.readline()
-                # start of new event
-                if line and line[0] != " " and line[0] != "\n":
-                    self.__add_record(record)
-                    record = EventRecord()
-                    record.add_row(line)
-                # end of event
-                if line and line[0] == "\n":
-                    # usefull only to save record when waiting for output
-                    self.__add_record(record)
-                    record = EventRecord()
-                # text of events
-                if line and line[0] == " ":
-                    event_type = line.split()[0]
-                    if event_type not in field_blacklist:
-                        record.add_row(line)
-                #  wait for output
-                if not line:
-                    time.sleep(1)
-            process.kill()
+    def event_line(self, line):
+        """Add line of zpool events output to event log"""
+        # ignore header, printed again when process is restarted
+        if line.startswith("TIME "):
+            return
+        # start of new event
+        if line[0] != " " and line[0] != "\n":
+            self.__add_record(self.record)
+            self.record = EventRecord()
+            self.record.add_row(line)
+        # end of event
+        if line[0] == "\n":
+            self.__add_record(self.record)
+            self.record = EventRecord()
+        # text of events
+        if line[0] == " ":
+            event_type = line.split()[0]
+            if event_type == "eid":
+                self.record.eid = parse_eid(line)
+            if event_type not in FIELD_BLACKLIST:
+                self.record.add_row(line)
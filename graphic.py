@@ -45,7 +45,38 @@ class Hideable(metaclass=abc.ABCMeta):
         return not self.is_hidden()
 
 
-class GraphicObject(Hideable):
+class Damageable:
+    """Mixin for objects which skip redraw when their source didn't change
+
+    damage_key returns value which changes with data shown by object, usually
+    counter of source bumped by collector. During partial redraw objects with
+    the same key as when they were drawn only copy their content to screen
+    again. Object with None key is always drawn.
+    """
+
+    partial_redraw = False
+    drawn_key = None
+
+    # pylint: disable=no-self-use
+    def damage_key(self):
+        """Return key of shown data, None if it is not known"""
+        return None
+
+    def is_damaged(self):
+        """Return True if object must be drawn, remember key of drawn data"""
+        key = self.damage_key()
+        if Damageable.partial_redraw and key is not None and key == self.drawn_key:
+            return False
+        self.drawn_key = key
+        return True
+
+    def restore(self):
+        """Copy content drawn before to screen again"""
+        self.window.touchwin()
+        self.window.noutrefresh()
+
+
+class GraphicObject(Hideable, Damageable):
     """Basic class for graphic object, save position and size"""
 
     color_initialized = False
@@ -87,7 +118,10 @@ class GraphicObject(Hideable):
     def draw(self):
         """Call internal draw function if object of visible"""
         if self.is_visible():
-            self._draw()
+            if self.is_damaged():
+                self._draw()
+            else:
+                self.restore()
 
 
 # pylint: disable=too-many-instance-attributes
@@ -218,6 +252,16 @@ class Menu(GraphicObject):
         """Refresh window"""
         self.window.noutrefresh()
 
+    def damage_key(self):
+        """Menu changes only by user input or when its items are updated"""
+        return (
+            tuple(self.menu_entries),
+            self.entry_id,
+            self.shift,
+            self.max_visible_items,
+            tuple(self.graylist),
+        )
+
     @abc.abstractmethod
     def _draw(self):
         pass
@@ -276,22 +320,36 @@ class VerticalMenu(Menu):
 
     def __init__(self, menu_entries, s_r, s_c, entry_id=0, length=0, max_item_len=9999, **kwargs):
         # todo: length: assert and limit string length
-        self.max_length = 0
-        item_count = 0
         self.length = length
         self.max_item_len = max_item_len
-
-        for item in menu_entries:
-            if len(item) > self.max_length:
-                self.max_length = len(item)
-            item_count += 1
-        if length > 0:
-            self.max_length = length
-        self.max_length = min(self.max_length, self.max_item_len)
+        self.max_length = self.entries_length(menu_entries)
+        item_count = len(menu_entries)
         super().__init__(
             menu_entries, s_r, s_c, item_count * 2 + 1, self.max_length + 4, entry_id, **kwargs
         )
 
+    def entries_length(self, menu_entries):
+        """Return width of menu items"""
+        max_length = 0
+        for item in menu_entries:
+            if len(item) > max_length:
+                max_length = len(item)
+        if self.length > 0:
+            max_length = self.length
+        return min(max_length, self.max_item_len)
+
+    def update_menu(self, menu_entries):
+        """Update menu items, keep selected item if it is still in menu
+
+        Window must be resized after update.
+        """
+        selected = self.selected()
+        self.max_length = self.entries_length(menu_entries)
+        self._update_menu(len(menu_entries) * 2 + 1, self.max_length + 4, menu_entries)
+        self.shift = 0
+        self.max_visible_items = len(menu_entries)
+        self.set_pos(selected)
+
     def set_max_size(self, max_size):
         """Limit max size of menu window"""
         if max_size % 2 != 1:
@@ -300,6 +358,9 @@ class VerticalMenu(Menu):
         self.max_size = max_size
         self.size_r = max_size + 0
         self.max_visible_items = (max_size - 1) // 2
+        # keep selected item visible after menu update
+        if self.entry_id >= self.shift + self.max_visible_items:
+            self.shift = self.entry_id - self.max_visible_items + 1
 
     def _draw(self):
         self.window.erase()
@@ -87,6 +87,8 @@ class TimeWindow(Gui):
 
     def __init__(self, main_screen, period):
         self.should_exit = False
+        # shown instead of time when set, state on screen is not updated
+        self.status = None
         self.__main_screen = main_screen
         self.__period = period
         _, cols = main_screen.getmaxyx()
@@ -97,8 +99,13 @@ class TimeWindow(Gui):
         threading.Thread(target=self.__timer_loop, daemon=True, name="Timer").start()
 
     def _draw(self):
-        time_string = time.strftime("%c", time.localtime())
-        self.window.addstr(1, 2, time_string)
+        if self.status is not None:
+            self.window.addstr(
+                1, 2, self.status[: self.__text_len].center(self.__text_len), curses.color_pair(4)
+            )
+        else:
+            time_string = time.strftime("%c", time.localtime())
+            self.window.addstr(1, 2, time_string)
         self.window.border()
         self.window.addch(0, 0, curses.ACS_TTEE)
         self.window.addch(0, self.__text_len + 3, curses.ACS_URCORNER)
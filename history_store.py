@@ -0,0 +1,275 @@
+"""Module for optional on-disk store of time series history
+
+Series of one history object (dataset, pool, ARC) are kept together in one
+fixed size segment file mapped to memory, so history is mapped back on start
+without any parsing and every history object needs only one mapping. Segment
+file contains header, table of tracks and data of tracks:
+
+    header: magic, version, number of tracks
+    track: typecode, key, size, interval, count, timestamp of last sample
+
+Track is ring buffer of one series or state of series. Key is checksum of
+series name and track index, so segment is recreated when layout changes.
+Sample is always written before count is increased, so after crash segment
+contains consistent history up to last committed count.
+"""
+
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from urllib.parse import quote
+
+MAGIC = b"ZVTS"
+VERSION = 2
+HEADER = struct.Struct("=4sBxxxq")
+TRACK = struct.Struct("=cxxxIqqqq")
+# offset of count and timestamp in track table entry
+STATE_OFFSET = 24
+SUFFIX = ".ts"
+MISSING = -1
+
+
+class Track:
+    """Data and committed state of one track in segment"""
+
+    def __init__(self, state, data, interval):
+        self.state = state
+        self.data = data
+        self.interval = interval
+
+    def count(self):
+        """Return number of samples ever appended to series"""
+        return self.state[0]
+
+    def gap(self):
+        """Return number of samples missed since last sample was written"""
+        if self.interval <= 0 or self.state[1] == 0:
+            return 0
+        return max(int(time.time() - self.state[1]) // self.interval, 0)
+
+    def commit(self, count):
+        """Save count of samples after new sample was written"""
+        self.state[1] = int(time.time())
+        self.state[0] = count
+
+
+class Segment:
+    """Memory mapped file with tracks of series
+
+    Layout is list of (key, size, typecode, interval) of tracks. When segment
+    is opened read only, file is mapped copy on write, so series can be
+    appended in memory without modifying file of other writer.
+    """
+
+    def __init__(self, path, layout, writable):
+        table = HEADER.pack(MAGIC, VERSION, len(layout))
+        offsets = []
+        length = HEADER.size + TRACK.size * len(layout)
+        for key, size, typecode, interval in layout:
+            table += TRACK.pack(typecode.encode(), key, size, interval, 0, 0)
+            offsets.append(length)
+            # keep every track aligned to 8 bytes
+            length += (size * array(typecode).itemsize + 7) // 8 * 8
+        if writable:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        else:
+            fd = os.open(path, os.O_RDONLY)
+        try:
+            if not self.is_valid(fd, length, table, len(layout)):
+                if not writable:
+                    raise ValueError("invalid history segment " + path)
+                self.create(fd, layout, table, offsets, length)
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY
+            self.map = mmap.mmap(fd, length, access=access)
+        finally:
+            os.close(fd)
+        view = memoryview(self.map)
+        self.tracks = []
+        for index, (_, size, typecode, interval) in enumerate(layout):
+            entry = HEADER.size + TRACK.size * index
+            state = view[entry + STATE_OFFSET : entry + TRACK.size].cast("q")
+            itemsize = array(typecode).itemsize
+            data = view[offsets[index] : offsets[index] + size * itemsize].cast(typecode)
+            self.tracks.append(Track(state, data, interval))
+
+    # pylint: disable=no-self-use
+    def is_valid(self, fd, length, table, tracks):
+        """Check if file contains segment of the same layout"""
+        if os.fstat(fd).st_size != length:
+            return False
+        header = os.pread(fd, len(table), 0)
+        if header[: HEADER.size] != table[: HEADER.size]:
+            return False
+        for index in range(0, tracks):
+            entry = HEADER.size + TRACK.size * index
+            if header[entry : entry + STATE_OFFSET] != table[entry : entry + STATE_OFFSET]:
+                return False
+        return True
+
+    # pylint: disable=no-self-use
+    def create(self, fd, layout, table, offsets, length):
+        """Write empty segment to file"""
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, table, 0)
+        for (_, size, typecode, _), offset in zip(layout, offsets):
+            os.pwrite(fd, (array(typecode, [MISSING]) * size).tobytes(), offset)
+        # padding of the last track is not written
+        os.ftruncate(fd, length)
+
+
+class HistoryStore:
+    """Directory of history segments
+
+    Only one process holding lock of directory writes segments, others map
+    them read only. Segments which can't be mapped, for example when process
+    reaches vm.max_map_count, are counted and passed to report function,
+    their history is kept only in memory. Segments of dropped history
+    objects are removed by writer, prune removes segments of objects which
+    were dropped while no writer was running.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.failures = 0
+        self.last_error = None
+        self.report = None
+        # names of mapped and failed segments, they are kept by prune
+        self.names = set()
+        self.lock = threading.Lock()
+        # pylint: disable=consider-using-with
+        self.lock_file = open(os.path.join(directory, "lock"), "a", encoding="utf8")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.writable = True
+        except OSError:
+            self.writable = False
+
+    def map(self, name, members):
+        """Map segment of name and attach its tracks to members
+
+        Members are (owner, series name, layout) where layout is list of
+        (size, typecode, interval) of tracks of owner.
+        """
+        layout = []
+        for _, series_name, series_layout in members:
+            for index, (size, typecode, interval) in enumerate(series_layout):
+                key = zlib.crc32((series_name + "." + str(index)).encode())
+                layout.append((key, size, typecode, interval))
+        with self.lock:
+            self.names.add(name)
+        try:
+            segment = Segment(self.path(name), layout, self.writable)
+        except (OSError, ValueError) as error:
+            self.fail(name, error)
+            return
+        start = 0
+        for owner, _, series_layout in members:
+            owner.attach(segment.tracks[start : start + len(series_layout)])
+            start += len(series_layout)
+
+    def path(self, name):
+        """Return path of segment file of name"""
+        return os.path.join(self.directory, quote(name, safe="") + SUFFIX)
+
+    def drop(self, name):
+        """Remove segment of history object which no longer exists
+
+        Series keep their mapping, only file is removed.
+        """
+        with self.lock:
+            self.names.discard(name)
+        if not self.writable:
+            return
+        try:
+            os.unlink(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        """Remove segments which were not mapped by this process"""
+        if not self.writable:
+            return
+        # names are added before files are created, so listed files have their names
+        files = os.listdir(self.directory)
+        with self.lock:
+            keep = {quote(name, safe="") + SUFFIX for name in self.names}
+        for file_name in files:
+            if file_name.endswith(SUFFIX) and file_name not in keep:
+                try:
+                    os.unlink(os.path.join(self.directory, file_name))
+                except FileNotFoundError:
+                    pass
+
+    def fail(self, name, error):
+        """Report segment which can't be mapped"""
+        self.failures += 1
+        self.last_error = "history of " + name + " is kept only in memory: " + str(error)
+        if self.report is not None:
+            self.report(self.last_error)
+
+
+STORE = None
+# series registered in group block of thread
+LOCAL = threading.local()
+
+
+def open_store(directory):
+    """Keep history of all series created later in directory"""
+    global STORE  # pylint: disable=global-statement
+    STORE = HistoryStore(directory)
+    return STORE
+
+
+@contextlib.contextmanager
+def group(name):
+    """Map named series created in block to one segment of name"""
+    if STORE is None:
+        yield
+        return
+    outer = getattr(LOCAL, "members", None)
+    LOCAL.members = []
+    try:
+        yield
+        members = LOCAL.members
+    finally:
+        LOCAL.members = outer
+    if members:
+        STORE.map(name, members)
+
+
+def drop(name):
+    """Remove segment of name when store is open"""
+    if STORE is not None:
+        STORE.drop(name)
+
+
+def prune():
+    """Remove segments of history objects which no longer exist
+
+    Called when all history objects were created, segments not mapped by
+    then belong to destroyed datasets or pools.
+    """
+    if STORE is not None:
+        STORE.prune()
+
+
+def register(owner, name, layout):
+    """Attach tracks to named series when store is open
+
+    Series created in group block are attached when block ends, other ones
+    get their own segment immediately.
+    """
+    if STORE is None or name is None:
+        return
+    members = getattr(LOCAL, "members", None)
+    if members is None:
+        STORE.map(name, [(owner, name, layout)])
+    else:
+        members.append((owner, name, layout))
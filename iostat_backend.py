@@ -0,0 +1,366 @@
+"""Module with sources of pool IO stats
+
+Backend is started in collector loop and passes rows in format of
+zpool iostat -vHPLlp to collector.io_line(), collector.flush_io() is called
+after every interval. Rows of every pool start with pool row. Backend which
+fails later calls collector.start_next_backend(). collector.io_line()
+returns False for device row which doesn't match pool topology.
+
+TextBackend parses output of zpool iostat. LibzfsBackend reads vdev stats
+from pool config of libzfs directly, so no process is forked and latencies
+are averaged from full latency histograms, which are passed to
+collector.io_histograms().
+"""
+
+import ctypes
+import ctypes.util
+import os
+
+LATENCY_HISTOGRAMS = {
+    "r_tw": "vdev_tot_r_lat_histo",
+    "w_tw": "vdev_tot_w_lat_histo",
+    "r_dw": "vdev_disk_r_lat_histo",
+    "w_dw": "vdev_disk_w_lat_histo",
+    "r_sw": "vdev_sync_r_lat_histo",
+    "w_sw": "vdev_sync_w_lat_histo",
+    "r_aw": "vdev_async_r_lat_histo",
+    "w_aw": "vdev_async_w_lat_histo",
+    "s_w": "vdev_scrub_histo",
+    "t_w": "vdev_trim_histo",
+}
+
+# indexes in vdev_stat_t
+VS_TIMESTAMP = 0
+VS_ALLOC = 3
+VS_SPACE = 4
+VS_OPS = 8
+VS_BYTES = 14
+ZIO_TYPE_READ = 1
+ZIO_TYPE_WRITE = 2
+
+SKIPPED_VDEV_TYPES = ("hole", "indirect")
+
+
+class BackendError(Exception):
+    """Backend can't be used"""
+
+
+# pylint: disable=too-many-arguments
+def add_iostat_process(loop, args, line_handler, idle_handler=None, interval=None, name=None):
+    """Run long running zpool iostat with args in collector loop
+
+    Process printing every interval is started on interval boundary.
+    """
+    return loop.add_process(
+        ["/sbin/zpool", "iostat"] + args,
+        line_handler,
+        idle_handler,
+        env={"ZPOOL_SCRIPTS_AS_ROOT": "yes"},
+        align=interval,
+        name=name,
+    )
+
+
+def open_backends(interval):
+    """Return usable backends, the preferred first"""
+    backends = []
+    try:
+        backends.append(LibzfsBackend(interval))
+    except BackendError:
+        pass
+    backends.append(TextBackend(interval))
+    return backends
+
+
+# pylint: disable=too-few-public-methods
+class TextBackend:
+    """Backend parsing output of zpool iostat"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.collector = None
+
+    def start(self, collector, loop):
+        """Pass rows of zpool iostat to collector, flush after every block"""
+        self.collector = collector
+        add_iostat_process(
+            loop,
+            ["-vHPLlp", str(self.interval)],
+            self.line,
+            collector.flush_io,
+            interval=self.interval,
+            name="pools iostat",
+        )
+
+    def line(self, line):
+        """Pass one line of zpool iostat to collector"""
+        if len(line) > 3:
+            self.collector.io_line(line.split())
+
+
+class Libzfs:
+    """Minimal ctypes binding of libzfs and libnvpair
+
+    Handle of libzfs is not thread safe, it must be used by one thread.
+    """
+
+    def __init__(self):
+        zfs_path = ctypes.util.find_library("zfs")
+        nvpair_path = ctypes.util.find_library("nvpair")
+        if zfs_path is None or nvpair_path is None:
+            raise BackendError("libzfs not found")
+        try:
+            self.zfs = ctypes.CDLL(zfs_path)
+            self.nvpair = ctypes.CDLL(nvpair_path)
+        except OSError as error:
+            raise BackendError(str(error)) from error
+
+        self.zfs.libzfs_init.restype = ctypes.c_void_p
+        self.zfs.zpool_open_canfail.restype = ctypes.c_void_p
+        self.zfs.zpool_open_canfail.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        self.zfs.zpool_refresh_stats.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+        self.zfs.zpool_get_config.restype = ctypes.c_void_p
+        self.zfs.zpool_get_config.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self.zfs.zpool_close.argtypes = [ctypes.c_void_p]
+        self.nvpair.nvlist_lookup_nvlist.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(ctypes.c_void_p),
+        ]
+        self.nvpair.nvlist_lookup_nvlist_array.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(ctypes.POINTER(ctypes.c_void_p)),
+            ctypes.POINTER(ctypes.c_uint),
+        ]
+        self.nvpair.nvlist_lookup_uint64_array.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(ctypes.POINTER(ctypes.c_uint64)),
+            ctypes.POINTER(ctypes.c_uint),
+        ]
+        self.nvpair.nvlist_lookup_uint64.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(ctypes.c_uint64),
+        ]
+        self.nvpair.nvlist_lookup_string.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(ctypes.c_char_p),
+        ]
+
+        self.handle = self.zfs.libzfs_init()
+        if not self.handle:
+            raise BackendError("libzfs_init failed")
+        self.pools = {}
+
+    def pool_config(self, name):
+        """Return config nvlist of pool with refreshed stats or None"""
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = self.zfs.zpool_open_canfail(self.handle, name.encode())
+            if not pool:
+                return None
+            self.pools[name] = pool
+        missing = ctypes.c_int(0)
+        if self.zfs.zpool_refresh_stats(pool, ctypes.byref(missing)) != 0 or missing.value:
+            self.close_pool(name)
+            return None
+        return self.zfs.zpool_get_config(pool, None)
+
+    def close_pool(self, name):
+        """Close handle of pool"""
+        pool = self.pools.pop(name, None)
+        if pool is not None:
+            self.zfs.zpool_close(pool)
+
+    def lookup_nvlist(self, nvlist, key):
+        """Return nested nvlist or None"""
+        value = ctypes.c_void_p()
+        if self.nvpair.nvlist_lookup_nvlist(nvlist, key.encode(), ctypes.byref(value)) != 0:
+            return None
+        return value
+
+    def lookup_nvlist_array(self, nvlist, key):
+        """Return list of nested nvlists, empty if key is missing"""
+        value = ctypes.POINTER(ctypes.c_void_p)()
+        count = ctypes.c_uint()
+        if (
+            self.nvpair.nvlist_lookup_nvlist_array(
+                nvlist, key.encode(), ctypes.byref(value), ctypes.byref(count)
+            )
+            != 0
+        ):
+            return []
+        return [ctypes.c_void_p(value[i]) for i in range(0, count.value)]
+
+    def lookup_uint64_array(self, nvlist, key):
+        """Return list of ints or None"""
+        value = ctypes.POINTER(ctypes.c_uint64)()
+        count = ctypes.c_uint()
+        if (
+            self.nvpair.nvlist_lookup_uint64_array(
+                nvlist, key.encode(), ctypes.byref(value), ctypes.byref(count)
+            )
+            != 0
+        ):
+            return None
+        return value[: count.value]
+
+    def lookup_uint64(self, nvlist, key):
+        """Return int or None"""
+        value = ctypes.c_uint64()
+        if self.nvpair.nvlist_lookup_uint64(nvlist, key.encode(), ctypes.byref(value)) != 0:
+            return None
+        return value.value
+
+    def lookup_string(self, nvlist, key):
+        """Return string or None"""
+        value = ctypes.c_char_p()
+        if self.nvpair.nvlist_lookup_string(nvlist, key.encode(), ctypes.byref(value)) != 0:
+            return None
+        return value.value.decode("utf8", errors="replace")
+
+
+def histogram_average(histogram):
+    """Return average latency of histogram with power of 2 ns buckets as zpool does"""
+    count = 0
+    total = 0
+    for bucket, value in enumerate(histogram):
+        if value:
+            total += value * ((1 << bucket) + (1 << bucket) // 2)
+            count += value
+    if count == 0:
+        return None
+    return total // count
+
+
+class LibzfsBackend:
+    """Backend reading vdev stats from libzfs
+
+    Stats in pool config are cumulative, rows contain differences against
+    stats of previous interval.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lib = Libzfs()
+        self.previous = {}
+        self.collector = None
+        self.timer = None
+        # device rows of current interval matching and not matching topology
+        self.matched = 0
+        self.unmatched = 0
+
+    def start(self, collector, loop):
+        """Pass rows of all pools to collector every interval"""
+        self.collector = collector
+        self.timer = loop.add_timer(self.interval, self.tick, name="pools io")
+
+    def tick(self):
+        """Collect one interval, switch to next backend on failure"""
+        try:
+            self.collect(self.collector)
+        except BackendError:
+            self.timer.cancel()
+            self.collector.start_next_backend()
+
+    def collect(self, collector):
+        """Pass rows of all pools to collector
+
+        Backend fails when pool can't be read or when no device matches
+        topology read by zpool list, text backend is used instead.
+        """
+        self.matched = 0
+        self.unmatched = 0
+        for name in collector.pool_names():
+            config = self.lib.pool_config(name)
+            if config is None:
+                raise BackendError("can't read stats of pool " + name)
+            tree = self.lib.lookup_nvlist(config, "vdev_tree")
+            if tree is None:
+                raise BackendError("pool config without vdev tree")
+            self.vdev_rows(collector, name, name, tree)
+            for cache in self.lib.lookup_nvlist_array(tree, "l2cache"):
+                self.vdev_rows(collector, name, self.vdev_name(cache), cache)
+        for name in list(self.lib.pools):
+            if name not in collector.pool_names():
+                self.lib.close_pool(name)
+        if self.unmatched and not self.matched:
+            raise BackendError("vdev names don't match pool topology")
+        collector.flush_io()
+
+    def vdev_name(self, vdev):
+        """Return name of vdev as printed by zpool iostat -PL"""
+        vdev_type = self.lib.lookup_string(vdev, "type")
+        if vdev_type in ("disk", "file"):
+            # -L resolves links like /dev/disk/by-id
+            return os.path.realpath(self.lib.lookup_string(vdev, "path"))
+        if vdev_type == "raidz":
+            vdev_type += str(self.lib.lookup_uint64(vdev, "nparity"))
+        return str(vdev_type) + "-" + str(self.lib.lookup_uint64(vdev, "id"))
+
+    # pylint: disable=too-many-arguments
+    def vdev_rows(self, collector, pool_name, name, vdev):
+        """Pass rows of vdev and its children to collector"""
+        if self.lib.lookup_string(vdev, "type") in SKIPPED_VDEV_TYPES:
+            return
+        stats = self.lib.lookup_uint64_array(vdev, "vdev_stats")
+        if stats is None or len(stats) < VS_BYTES + ZIO_TYPE_WRITE + 1:
+            raise BackendError("vdev without stats")
+        histograms = {}
+        stats_ex = self.lib.lookup_nvlist(vdev, "vdev_stats_ex")
+        if stats_ex is not None:
+            for param, key in LATENCY_HISTOGRAMS.items():
+                histograms[param] = self.lib.lookup_uint64_array(stats_ex, key)
+
+        key = (pool_name, name)
+        previous = self.previous.get(key)
+        self.previous[key] = (stats, histograms)
+        if previous is not None:
+            row, deltas = self.row(name, previous, (stats, histograms))
+            matched = collector.io_line(row)
+            # pool and raid rows always match
+            if name.startswith("/") and matched is not None:
+                if matched:
+                    self.matched += 1
+                else:
+                    self.unmatched += 1
+            collector.io_histograms(name, deltas)
+
+        for child in self.lib.lookup_nvlist_array(vdev, "children"):
+            self.vdev_rows(collector, pool_name, self.vdev_name(child), child)
+
+    def row(self, name, previous, current):
+        """Return row of zpool iostat -vHPLlp and latency histogram differences"""
+        old_stats, old_histograms = previous
+        stats, histograms = current
+        elapsed = stats[VS_TIMESTAMP] - old_stats[VS_TIMESTAMP]
+        if elapsed <= 0:
+            elapsed = self.interval * 1000000000
+        scale = 1000000000 / elapsed
+
+        row = [name]
+        if stats[VS_SPACE]:
+            row += [str(stats[VS_ALLOC]), str(stats[VS_SPACE] - stats[VS_ALLOC])]
+        else:
+            row += ["-", "-"]
+        for index in (
+            VS_OPS + ZIO_TYPE_READ,
+            VS_OPS + ZIO_TYPE_WRITE,
+            VS_BYTES + ZIO_TYPE_READ,
+            VS_BYTES + ZIO_TYPE_WRITE,
+        ):
+            row.append(str(int((stats[index] - old_stats[index]) * scale)))
+
+        deltas = {}
+        for param in LATENCY_HISTOGRAMS:
+            histogram = histograms.get(param)
+            old_histogram = old_histograms.get(param)
+            average = None
+            if histogram is not None and old_histogram is not None:
+                deltas[param] = [new - old for new, old in zip(histogram, old_histogram)]
+                average = histogram_average(deltas[param])
+            row.append("-" if average is None else str(average))
+        return row, deltas
@@ -9,7 +9,6 @@ import scroll_pad
 import utils
 import gui
 import row_graph
-import reads_stats_history
 
 
 class PIDWindowBarGraph(graphic.BarGraph):
@@ -38,7 +37,7 @@ class PIDWindowBarGraph(graphic.BarGraph):
         dataset = self.menu.selected()
 
         try:
-            stats = self.zfs.zpools[pool].read_stats.dataset_stats[dataset].flags_stats
+            stats = dict(self.zfs.zpools[pool].read_stats.dataset_stats[dataset].flags_stats)
         except KeyError:
             stats = {}
         #    "SYNC"          : 1 << 0,
@@ -66,14 +65,10 @@ class PIDWindowBarGraph(graphic.BarGraph):
         """Main draw function"""
         # todo zfs_utils
         pool = self.menu.selected().split("/")[0]
-        try:
-            if self.last_uid < int(
-                self.zfs.zpools[self.menu.selected().split("/")[0]].read_stats.history.queue[0].uid
-            ):
-                self.last_uid = int(self.zfs.zpools[pool].read_stats.history.queue[0].uid)
-                self.prepare_data()
-        except IndexError:
-            pass
+        last_uid = self.zfs.zpools[pool].read_stats.history.last_uid()
+        if self.last_uid < last_uid:
+            self.last_uid = last_uid
+            self.prepare_data()
         super()._draw()
 
 
@@ -94,16 +89,16 @@ class PIDRowGraph(row_graph.RowGraph):
         dataset = self.zfs.dataset_by_name(self.menu.selected())
         pool = dataset.name.split("/")[0]
         try:
-            source = self.zfs.zpools[pool].read_stats.dataset_stats[dataset.name].pid_stats
+            source = dict(self.zfs.zpools[pool].read_stats.dataset_stats[dataset.name].pid_stats)
         except KeyError:
             source = {}
         out = {}
         for key in source:
             try:
                 process_name = self.zfs.zpools[pool].read_stats.pid_map[key]
-                out[process_name + " (" + key + ")"] = source[key]
+                out[process_name + " (" + str(key) + ")"] = source[key]
             except KeyError:
-                out["Unknown" + " (" + key + ")"] = source[key]
+                out["Unknown" + " (" + str(key) + ")"] = source[key]
         self.set_values(out)
 
 
@@ -122,7 +117,7 @@ class PIDDatasetRowGraph(row_graph.RowGraph):
         """Convert data to row graph format"""
         out = {}
         for pool in self.zfs.get_pools():
-            for dataset in self.zfs.zpools[pool].read_stats.dataset_stats:
+            for dataset in list(self.zfs.zpools[pool].read_stats.dataset_stats):
                 if pool != dataset:
                     try:
                         out[dataset] = self.zfs.zpools[pool].read_stats.dataset_stats[dataset].count
@@ -237,12 +232,15 @@ class PIDWindow(app_window.AppWindow):
         self.draw()
         self.refresh()
 
+    def update_sources(self):
+        """Show loaded datasets"""
+        self.dataset_menu.update_menu(self.zfs.get_datasets())
+
     def rescan(self):
-        """Rescan"""
-        # todo
-        del self.dataset_menu
+        """Rescan datasets and show changes"""
         self.zfs.rescan_datasets()
-        self.dataset_menu = graphic.VerticalMenu(self.window, self.zfs.get_datasets(), 4, 2, 1)
+        self.update_sources()
+        self.resize(0, 0, 0, 0)
 
     def _draw(self):
         self.window.border()
@@ -369,17 +367,49 @@ class PIDStatsWindow(window.Window):
         pass
 
 
-class PIDSmallWindow(scroll_pad.ScrollPad):
+class PIDSmallWindow(scroll_pad.ListPad):
     """Subwindow showing list of reads by dataset"""
 
+    header_rows = 1
+
     def __init__(self, s_r, s_c, size_r, size_c, zfs, Menu):
         self.menu = Menu
         self.zfs = zfs
-        super().__init__(s_r, s_c, reads_stats_history.MAX_RECORDS, 200, size_r, size_c)
+        self.separation = None
+        # records of visible rows, started by draw_header
+        self.records = iter(())
+        super().__init__(s_r, s_c, 200, size_r, size_c)
         self.draw()
 
-    def print_header(self, separation):
-        """Print window header"""
+    def history(self):
+        """Return read history of pool of selected dataset and dataset name filter"""
+        name = self.menu.selected()
+        pool = name.split("/")[0]
+        if name == pool:
+            return self.zfs.zpools[pool].read_stats.history, None
+        return self.zfs.zpools[pool].read_stats.history, name
+
+    def row_count(self):
+        history, dataset_name = self.history()
+        return history.count_reads(dataset_name)
+
+    def draw_header(self):
+        """Set columns by names in history and print window header"""
+        history, dataset_name = self.history()
+        visible = self.w_size_r - 2 - self.header_rows
+        self.records = iter(history.records(dataset_name, self.view_r, self.view_r + visible))
+        # names of all reads in history are in name tables, so columns don't move on scroll
+        max_dataset_length = max(map(len, history.dataset_names), default=0)
+        max_processname_legth = max(map(len, history.process_names), default=0)
+
+        separation = [1, 12, 0, 10, 7, 10]
+        if (
+            dataset_name is None
+            and self.w_size_c > sum(separation) + max_processname_legth + max_dataset_length + 4
+        ):
+            separation[2] = max_dataset_length + 3
+        self.separation = separation
+
         col = separation[0]
         self.window.addstr(0, col, "UID", curses.A_BOLD)
         col += separation[1]
@@ -394,56 +424,29 @@ class PIDSmallWindow(scroll_pad.ScrollPad):
         col += separation[5]
         self.window.addstr(0, col, "process", curses.A_BOLD)
 
-    def print_data(self):
-        """Print data"""
-        dataset = self.zfs.dataset_by_name(self.menu.selected())
-        pool = dataset.name.split("/")[0]
-        i = 1
-
-        max_dataset_length = 0
-        max_processname_legth = 0
-        for record in list(self.zfs.zpools[pool].read_stats.history.queue):
-            if dataset.name in (record.dataset_name, pool):
-                if len(record.dataset_name) > max_dataset_length:
-                    max_dataset_length = len(record.dataset_name)
-                if len(record.process) > max_processname_legth:
-                    max_processname_legth = len(record.process)
-
-        separation = [1, 12, 0, 10, 7, 10]
-        if (
-            dataset.name == pool
-            and self.w_size_c > sum(separation) + max_processname_legth + max_dataset_length + 4
-        ):
-            separation[2] = max_dataset_length + 3
-
-        self.print_header(separation)
-
-        for record in list(self.zfs.zpools[pool].read_stats.history.queue):
-            if dataset.name in (record.dataset_name, pool):
-                col = separation[0]
-                try:
-                    self.window.addstr(i, col, record.uid)
-                except curses.error:
-                    break
-                col += separation[1]
-
-                if dataset.name == pool and separation[2] > 0:
-                    self.window.addstr(i, col, record.dataset_name)
-                    col += separation[2]
+    # pylint: disable=unused-argument
+    def draw_row(self, row, index):
+        record = next(self.records, None)
+        # read fell out of history after rows were counted
+        if record is None:
+            return 0
+        separation = self.separation
+        col = separation[0]
+        self.window.addstr(row, col, str(record.uid))
+        col += separation[1]
 
-                self.window.addstr(i, col, record.object_id)
-                col += separation[3]
+        if separation[2] > 0:
+            self.window.addstr(row, col, record.dataset_name)
+            col += separation[2]
 
-                self.window.addstr(i, col, ",".join(map(str, record.flags)))
-                col += separation[4]
+        self.window.addstr(row, col, str(record.object_id))
+        col += separation[3]
 
-                self.window.addstr(i, col, record.pid)
-                col += separation[5]
+        self.window.addstr(row, col, ",".join(map(str, record.flags)))
+        col += separation[4]
 
-                self.window.addstr(i, col, record.process)
-                i += 1
+        self.window.addstr(row, col, str(record.pid))
+        col += separation[5]
 
-    def _draw(self):
-        self.window.erase()
-        self.print_data()
-        self.refresh()
+        self.window.addstr(row, col, record.process)
+        return 1
@@ -67,7 +67,7 @@ class PoolWindow(app_window.AppWindow):
             155,
             (rows - 7) // 2,
             cols - (self.pool_menu.get_size()[1] + col + 2 + 60),
-            self.zfs.log,
+            self.zfs,
         )
         pool = self.zfs.zpools[self.pool_menu.selected()]
         self.events_pad = EventPad(
@@ -77,7 +77,7 @@ class PoolWindow(app_window.AppWindow):
             155,
             (rows - 7) - (rows - 7) // 2,
             cols - (self.pool_menu.get_size()[1] + col + 2 + 60),
-            pool.event_log.logs,
+            pool.event_log,
         )
         self.usage_bar = PoolWindowBarGraph(self.pool_menu, self.zfs, [], rows - 6, 2, 5, cols - 2)
 
@@ -118,6 +118,10 @@ class PoolWindow(app_window.AppWindow):
         self.draw()
         self.refresh()
 
+    def update_sources(self):
+        """Show loaded pool properties"""
+        self.usage_bar.prepare_data()
+
     def rescan(self):
         """Rescan"""
         self.zfs.rescan_pools()
@@ -139,7 +143,7 @@ class PoolWindow(app_window.AppWindow):
         if char == curses.KEY_DOWN:
             self.pool_menu.move_right()
             pool = self.zfs.zpools[self.pool_menu.selected()]
-            self.events_pad.change_queue(pool.event_log.logs)
+            self.events_pad.change_log(pool.event_log)
         if char == curses.KEY_NPAGE:
             for item in self.get_selected_elements():
                 item.scroll_down()
@@ -149,61 +153,67 @@ class PoolWindow(app_window.AppWindow):
         if char == curses.KEY_UP:
             self.pool_menu.move_left()
             pool = self.zfs.zpools[self.pool_menu.selected()]
-            self.events_pad.change_queue(pool.event_log.logs)
+            self.events_pad.change_log(pool.event_log)
         self.draw()
 
 
-class DbgmsgPad(scroll_pad.ScrollPad):
-    """Scrollpad printing data from queue"""
+class DbgmsgPad(scroll_pad.ListPad):
+    """Scrollpad printing dbgmsg log"""
 
-    def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, queue):
-        self.queue = queue
-        super().__init__(s_r, s_c, w_size_r, w_size_c, w_size_r, w_size_c, True)
+    def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, zfs):
+        self.zfs = zfs
+        self.lines = []
+        super().__init__(s_r, s_c, w_size_c, w_size_r, w_size_c)
         self.draw()
 
-    def change_queue(self, queue):
-        """Change input queue"""
-        self.queue = queue
+    def damage_key(self):
+        """Log changes when dbgmsg line is added"""
+        return self.zfs.log_count
 
-    def _draw(self):
-        self.window.erase()
-        i = 0
-        record = 0
-        for line in list(self.queue):
-            record += 1
-            data = line[10:]
-            self.add_line(i, 0, line[:8])
-            for sub_line in utils.split_on_words(data, self.window.getmaxyx()[1] - 11):
-                i += self.add_line(i, 9, sub_line)
-            if record > 10:
-                return
-
-
-class EventPad(scroll_pad.ScrollPad):
-    """Specialized pad for printing event log"""
-
-    def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, queue):
-        self.queue = queue
-        super().__init__(s_r, s_c, 30, size_c, w_size_r, w_size_c)
+    def row_count(self):
+        self.lines = list(self.zfs.log)
+        return len(self.lines)
+
+    def draw_row(self, row, index):
+        line = self.lines[index]
+        self.add_line(row, 0, line[:8])
+        shift = 0
+        for sub_line in utils.split_on_words(line[10:], self.window.getmaxyx()[1] - 11):
+            shift += self.add_line(row + shift, 9, sub_line)
+        return max(shift, 1)
+
+
+class EventPad(scroll_pad.ListPad):
+    """Specialized pad for printing event log
+
+    Every line of event is one row of list, lines are collected again only
+    when event is added.
+    """
+
+    def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, event_log):
+        self.event_log = event_log
+        self.lines = []
+        self.lines_key = None
+        super().__init__(s_r, s_c, size_c, w_size_r, w_size_c)
         self.draw()
 
-    def change_queue(self, queue):
-        """Change input queue"""
-        self.queue = queue
+    def change_log(self, event_log):
+        """Show event log of other pool"""
+        self.event_log = event_log
 
-    def _draw(self):
-        self.window.erase()
-        i = 0
-        rows = self.window.getmaxyx()[0]
-        for record in self.queue:
-            for line in record.rows:
-                if i < rows - 1:
-                    self.window.addstr(i, 0, line)
-                try:
-                    self.window.addstr(i, 0, line)
-                except curses.error:
-                    break
-                i += 1
+    def damage_key(self):
+        """Log changes when event is added"""
+        return (self.event_log, self.event_log.count)
+
+    def row_count(self):
+        if self.lines_key != self.damage_key():
+            self.lines_key = self.damage_key()
+            self.lines = [line for record in list(self.event_log.logs) for line in record.rows]
+        return len(self.lines)
+
+    def draw_row(self, row, index):
+        self.window.addstr(row, 0, self.lines[index])
+        return 1
 
 
 class PoolPad(scroll_pad.ScrollPad):
@@ -226,6 +236,8 @@ class PoolPad(scroll_pad.ScrollPad):
         self.window.addstr(i, 1, "Health:")
         if pool.property["health"] == "ONLINE":
             color = curses.color_pair(graphic.COLOR_OK)
+        elif not pool.loaded:
+            color = curses.color_pair(graphic.COLOR_WARN)
         else:
             color = curses.color_pair(graphic.COLOR_ERR)
         self.window.addstr(i, shift, pool.property["health"], color)
@@ -305,3 +317,28 @@ class PoolPad(scroll_pad.ScrollPad):
         for line in pool.frag_hist:
             inc = self.add_line(i, 1, line)
             i += inc
+        i += 1
+
+        # add_line grows pad for rows below
+        self.add_line(i, 1, "Collector timing:", curses.A_BOLD)
+        i += 1
+        self.add_line(i, 22, "jitter   max      run      overruns")
+        i += 1
+        for name, stats in sorted(list(self.zfs.tick_stats.items())):
+            self.add_line(i, 1, name[:20])
+            for col, value in enumerate([stats.mean_jitter(), stats.max_jitter, stats.duration]):
+                self.window.addstr(i, 22 + col * 9, utils.convert_time_ns(int(value * 1000000000)))
+            if stats.overruns:
+                color = curses.color_pair(graphic.COLOR_WARN)
+            else:
+                color = curses.color_pair(graphic.COLOR_OK)
+            self.window.addstr(i, 49, str(stats.overruns), color)
+            i += 1
+            # failed collector doesn't update its data
+            if stats.failures:
+                i += self.add_line(
+                    i,
+                    3,
+                    str(stats.failures) + " failures, " + stats.last_error,
+                    curses.color_pair(graphic.COLOR_ERR),
+                )
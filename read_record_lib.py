@@ -10,20 +10,30 @@ ARC_FLAGS = {"A": 1 << 1, "P": 1 << 2, "C": 1 << 3, "Z": 1 << 5, "S": 1 << 6}
 #    ARC_FLAG_PREDICTIVE_PREFETCH    = 1 << 5,   /* I/O from zfetch */
 #    ARC_FLAG_PRESCIENT_PREFETCH = 1 << 6,   /* long min lifespan */
 
+FLAGS_MASK = sum(ARC_FLAGS.values())
+
+# flag names for every possible masked aflags value
+FLAG_NAMES = [
+    tuple(name for name, flag in ARC_FLAGS.items() if value & flag)
+    for value in range(0, FLAGS_MASK + 1)
+]
+
+
 # pylint: disable=too-many-instance-attributes,too-few-public-methods
 class ReadRecord:
-    """One read record for pool reads"""
+    """One read record for pool reads
+
+    Created only when record is shown, history itself is stored in columns.
+    """
+
+    __slots__ = ("uid", "dataset_name", "object_id", "aflags", "pid", "process", "flags")
 
-    def __init__(self, uid, objset, dataset_name, object_id, aflags, pid, process):
+    # pylint: disable=too-many-arguments
+    def __init__(self, uid, dataset_name, object_id, aflags, pid, process):
         self.uid = uid
-        self.objset = objset
         self.object_id = object_id
         self.dataset_name = dataset_name
         self.aflags = aflags
         self.pid = pid
         self.process = process
-        self.flags = []
-        # pylint: disable=consider-using-dict-items
-        for flag in ARC_FLAGS:
-            if (int(aflags, 16) & ARC_FLAGS[flag]) != 0:
-                self.flags.append(flag)
+        self.flags = FLAG_NAMES[aflags & FLAGS_MASK]
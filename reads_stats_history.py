@@ -1,16 +1,266 @@
 """Module for saving historic stats for pool reads"""
 
-from collections import deque
+from array import array
 
-MAX_RECORDS = 300
+import read_record_lib
 
-# pylint: disable=too-few-public-methods
+MAX_RECORDS = 1000000
+COLUMNS = ("uid", "dataset", "object_id", "flags", "pid", "process")
+
+
+# pylint: disable=too-many-instance-attributes
 class ReadsHistory:
-    """Class representing history of pool reads"""
+    """Class representing history of pool reads
+
+    Reads are stored in columns of fixed capacity ring buffer. Dataset and
+    process names are interned and stored as index to name table, index of
+    name without any read in history is released and reused.
+    Row 0 is the newest read.
+
+    Read number n (count before it was added) is stored at position
+    n % capacity. Numbers of reads of every dataset are kept in ascending
+    order, so reads of one dataset are found without scanning history.
+    """
+
+    def __init__(self, capacity=MAX_RECORDS):
+        self.capacity = capacity
+        self.count = 0
+        self.uid = array("q")
+        self.dataset = array("i")
+        self.object_id = array("q")
+        self.flags = array("B")
+        self.pid = array("i")
+        self.process = array("i")
+        self.dataset_names = []
+        self.dataset_ids = {}
+        self.process_names = []
+        self.process_ids = {}
+        # released indexes of name tables
+        self.free_datasets = []
+        self.free_processes = []
+        # reads in history by interned index
+        self.dataset_reads = {}
+        self.process_reads = {}
+        # read numbers by dataset index, the last dataset_reads of them are in history
+        self.dataset_rows = {}
+        # changes when name table changes
+        self.names_version = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def intern(self, names, ids, free, name):
+        """Return index of name in names table, add it if missing"""
+        try:
+            return ids[name]
+        except KeyError:
+            pass
+        if free:
+            index = free.pop()
+            names[index] = name
+        else:
+            index = len(names)
+            names.append(name)
+        ids[name] = index
+        self.names_version += 1
+        return index
+
+    # pylint: disable=too-many-arguments
+    def release(self, names, ids, free, reads, index):
+        """Release index of name when no read in history uses it"""
+        if index in reads:
+            return
+        del ids[names[index]]
+        names[index] = ""
+        free.append(index)
+        self.names_version += 1
+
+    # pylint: disable=too-many-arguments
+    def add_node(self, uid, dataset_name, object_id, flags, pid, process):
+        """Add new read to history
+
+        Return (dataset_name, pid, flags) of read which fell out of history or None
+        """
+        dataset = self.intern(
+            self.dataset_names, self.dataset_ids, self.free_datasets, dataset_name
+        )
+        process = self.intern(self.process_names, self.process_ids, self.free_processes, process)
+        flags &= read_record_lib.FLAGS_MASK
+        dropped = self.put(uid, dataset, object_id, flags, pid, process)
+        if dropped is None:
+            return None
+        dropped_dataset, dropped_pid, dropped_flags, dropped_process = dropped
+        dataset_name = self.dataset_names[dropped_dataset]
+        self.release(
+            self.dataset_names,
+            self.dataset_ids,
+            self.free_datasets,
+            self.dataset_reads,
+            dropped_dataset,
+        )
+        self.release(
+            self.process_names,
+            self.process_ids,
+            self.free_processes,
+            self.process_reads,
+            dropped_process,
+        )
+        return (dataset_name, dropped_pid, dropped_flags)
+
+    # pylint: disable=too-many-arguments
+    def put(self, uid, dataset, object_id, flags, pid, process):
+        """Store read with interned names
+
+        Return (dataset, pid, flags, process) of read which fell out of history
+        or None, names are interned indexes.
+        """
+        number = self.count
+        self.dataset_reads[dataset] = self.dataset_reads.get(dataset, 0) + 1
+        self.process_reads[process] = self.process_reads.get(process, 0) + 1
+        try:
+            self.dataset_rows[dataset].append(number)
+        except KeyError:
+            self.dataset_rows[dataset] = array("q", [number])
+
+        if self.count < self.capacity:
+            self.uid.append(uid)
+            self.dataset.append(dataset)
+            self.object_id.append(object_id)
+            self.flags.append(flags)
+            self.pid.append(pid)
+            self.process.append(process)
+            self.count += 1
+            return None
+
+        pos = number % self.capacity
+        dropped = (self.dataset[pos], self.pid[pos], self.flags[pos], self.process[pos])
+        self.uid[pos] = uid
+        self.dataset[pos] = dataset
+        self.object_id[pos] = object_id
+        self.flags[pos] = flags
+        self.pid[pos] = pid
+        self.process[pos] = process
+        self.count += 1
+        self.remove_read(dropped[0], dropped[3])
+        return dropped
+
+    def remove_read(self, dataset, process):
+        """Forget read which fell out of history"""
+        reads = self.process_reads[process] - 1
+        if reads:
+            self.process_reads[process] = reads
+        else:
+            del self.process_reads[process]
+
+        reads = self.dataset_reads[dataset] - 1
+        if not reads:
+            del self.dataset_reads[dataset]
+            del self.dataset_rows[dataset]
+            return
+        self.dataset_reads[dataset] = reads
+        rows = self.dataset_rows[dataset]
+        # numbers of reads out of history are dropped when they are half of rows
+        if len(rows) > 2 * reads:
+            del rows[: len(rows) - reads]
+
+    def tail(self, since):
+        """Return count of reads and columns of reads added after since reads
+
+        Columns are arrays ordered from the oldest read as in COLUMNS. Reads
+        can be added by other thread, so columns are copied again when count
+        changes during copy. Oldest read is never copied, it is the one which
+        is overwritten before count changes.
+        """
+        while True:
+            count = self.count
+            length = min(count, self.capacity - 1)
+            if since <= count:
+                length = min(count - since, length)
+            start = (count - length) % self.capacity
+            columns = []
+            for name in COLUMNS:
+                column = getattr(self, name)
+                end = start + length
+                if end <= len(column):
+                    columns.append(column[start:end])
+                else:
+                    columns.append(column[start:] + column[: end - len(column)])
+            if self.count == count:
+                return count, columns
+
+    def clear(self):
+        """Forget all reads and names"""
+        self.__init__(self.capacity)  # pylint: disable=unnecessary-dunder-call
+
+    def sync(self, columns, dataset_names, process_names):
+        """Add reads received from other process
+
+        Name tables are replaced by tables of other process when they are not
+        None, indexes in columns refer to them.
+        """
+        if dataset_names is not None:
+            self.dataset_names = dataset_names
+            self.dataset_ids = {name: index for index, name in enumerate(dataset_names) if name}
+        if process_names is not None:
+            self.process_names = process_names
+            self.process_ids = {name: index for index, name in enumerate(process_names) if name}
+        for row in zip(*columns):
+            self.put(*row)
+
+    def position(self, row):
+        """Return position in columns of row counted from the newest read"""
+        return (self.count - 1 - row) % self.capacity
+
+    def last_uid(self):
+        """Return uid of newest read"""
+        if self.count == 0:
+            return 0
+        return self.uid[self.position(0)]
+
+    def record(self, row):
+        """Return ReadRecord for row counted from the newest read"""
+        return self.record_at(self.position(row))
+
+    def record_at(self, pos):
+        """Return ReadRecord stored at position in columns"""
+        return read_record_lib.ReadRecord(
+            self.uid[pos],
+            self.dataset_names[self.dataset[pos]],
+            self.object_id[pos],
+            self.flags[pos],
+            self.pid[pos],
+            self.process_names[self.process[pos]],
+        )
+
+    def count_reads(self, dataset_name=None):
+        """Return number of reads in history, optionaly only for one dataset"""
+        if dataset_name is None:
+            return len(self)
+        try:
+            return self.dataset_reads.get(self.dataset_ids[dataset_name], 0)
+        except KeyError:
+            return 0
 
-    def __init__(self):
-        self.queue = deque(maxlen=MAX_RECORDS)
+    def records(self, dataset_name=None, start=0, stop=None):
+        """Return ReadRecords from the newest, optionaly only for one dataset
 
-    def add_node(self, record):
-        """Add new reads to queue"""
-        self.queue.appendleft(record)
+        Only records from start to stop are returned, reads of dataset are
+        found by their numbers.
+        """
+        if dataset_name is None:
+            count = len(self)
+            if stop is None or stop > count:
+                stop = count
+            return [self.record(row) for row in range(start, stop)]
+        try:
+            dataset = self.dataset_ids[dataset_name]
+            rows = self.dataset_rows[dataset]
+        except KeyError:
+            return []
+        reads = self.dataset_reads.get(dataset, 0)
+        if stop is None or stop > reads:
+            stop = reads
+        if start >= stop:
+            return []
+        numbers = rows[len(rows) - stop : len(rows) - start]
+        return [self.record_at(number % self.capacity) for number in reversed(numbers)]
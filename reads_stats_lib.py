@@ -1,12 +1,12 @@
 """Module processing reads by pid"""
 
-import threading
 import time
 
 import read_record_lib
 import reads_stats_history
 
 COLLECT_INTERVAL_SEC = 5
+READ_BUFFER_SIZE = 1024 * 1024
 
 # ARC_FLAGS = {
 #    "SYNC"          : 1 << 0,
@@ -26,76 +26,95 @@ class ReadsStats:
         self.new_pid_stats = {}
         self.flags_stats = {}
         self.count = 0
+        # increased on every change, state sharing encodes only changed objects
+        self.version = 0
 
 
 # pylint: disable=too-many-instance-attributes
 class PoolReadsStats:
     """Class saving pool wide read stats"""
 
-    def __init__(self, name, datasets):
+    # pylint: disable=too-many-arguments
+    def __init__(self, name, datasets, objset_index, loop):
         self.pool_name = name
         self.datasets = datasets
+        self.objset_index = objset_index
         self.pid_map = {}
         self.dataset_stats = {}
         self.history = reads_stats_history.ReadsHistory()
-        self.init_read_stats()
+        self.reader = ReadsKstatReader("/proc/spl/kstat/zfs/" + name + "/reads")
         self.data_time_window = 0
         self.last_uid = 0
         self.shift = 0
+        self.init_read_stats(loop)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # kstat buffer is needed only by collector
+        del state["reader"]
+        return state
 
     def get_dataset_by_id(self, dataset_id):
-        """Return dataset by id"""
-        for dataset in self.datasets.values():
-            if int(dataset.property["objsetid"]) == int(dataset_id, 16):
-                return dataset
+        """Return dataset by id in hex format used by kstats"""
+        try:
+            return self.objset_index[dataset_id]
+        except KeyError:
+            pass
         if dataset_id == "0x0":
             return self.datasets[self.pool_name]
         return None
 
-    def init_read_stats(self):
-        """Fork thread to read reads"""
-        threading.Thread(target=self.reads_stats_loop, daemon=True, name="ReadStats").start()
-
-    def reads_stats_loop(self):
-        """Loop to read reads stats"""
-        self.get_time_shift()
-        while True:
-            self.load_read_stats()
-            time.sleep(1)
-
-    # pylint: disable=no-self-use
-    def save_stats(self, dataset_name, dataset_stats, pid, aflags):
-        """Save stats record"""
-        try:
-            _ = dataset_stats[dataset_name]
-        except KeyError:
-            dataset_stats[dataset_name] = ReadsStats()
+    def init_read_stats(self, loop):
+        """Read reads every second in collector loop"""
+        loop.call_soon(self.get_time_shift)
+        self.timer = loop.add_timer(1, self.load_read_stats, name=self.pool_name + " reads")
 
+    def save_stats(self, dataset_name, pid, flags, count):
+        """Add (count=1) or subtract (count=-1) read from dataset stats"""
+        dataset_stats = self.dataset_stats
         try:
-            dataset_stats[dataset_name].pid_stats[pid] += 1
+            stats = dataset_stats[dataset_name]
         except KeyError:
-            dataset_stats[dataset_name].pid_stats[pid] = 1
-
-        # pylint: disable=consider-using-dict-items
-        for flag in read_record_lib.ARC_FLAGS:
-            if (int(aflags, 16) & read_record_lib.ARC_FLAGS[flag]) != 0:
-                try:
-                    dataset_stats[dataset_name].flags_stats[flag] += 1
-                except KeyError:
-                    dataset_stats[dataset_name].flags_stats[flag] = 0
-
-        dataset_stats[dataset_name].count += 1
-
-    def calculate_stats(self):
-        """Recalculate dataset stats"""
-        dataset_stats = {}
-
-        for record in self.history.queue:
-            self.save_stats(record.dataset_name, dataset_stats, record.pid, record.aflags)
-
-            if record.dataset_name != self.pool_name:
-                self.save_stats(self.pool_name, dataset_stats, record.pid, record.aflags)
-        self.dataset_stats = dataset_stats
+            stats = ReadsStats()
+            dataset_stats[dataset_name] = stats
+
+        stats.count += count
+        stats.version += 1
+        if stats.count <= 0:
+            del dataset_stats[dataset_name]
+            return
+
+        value = stats.pid_stats.get(pid, 0) + count
+        if value > 0:
+            stats.pid_stats[pid] = value
+        else:
+            stats.pid_stats.pop(pid, None)
+
+        # every read counts once for each of its flags, first read of flag too
+        for flag in read_record_lib.FLAG_NAMES[flags]:
+            value = stats.flags_stats.get(flag, 0) + count
+            if value > 0:
+                stats.flags_stats[flag] = value
+            else:
+                stats.flags_stats.pop(flag, None)
+
+    def update_stats(self, dataset_name, pid, flags, count):
+        """Update stats of read dataset and whole pool"""
+        self.save_stats(dataset_name, pid, flags, count)
+        if dataset_name != self.pool_name:
+            self.save_stats(self.pool_name, pid, flags, count)
+
+    # pylint: disable=too-many-arguments
+    def add_record(self, uid, dataset_name, object_id, flags, pid, process):
+        """Add read to history and move stats window"""
+        flags &= read_record_lib.FLAGS_MASK
+        dropped = self.history.add_node(uid, dataset_name, object_id, flags, pid, process)
+        self.update_stats(dataset_name, pid, flags, 1)
+        if dropped is not None:
+            self.update_stats(*dropped, -1)
+            pool_stats = self.dataset_stats.get(self.pool_name)
+            if pool_stats is None or dropped[1] not in pool_stats.pid_stats:
+                self.pid_map.pop(dropped[1], None)
 
     def get_time_shift(self):
         """Read shift between unix and zfs time"""
@@ -108,51 +127,105 @@ class PoolReadsStats:
             timestamp = time.time() * 1000 * 1000 * 1000
             self.shift = timestamp - int(zfs_time)
 
-    # pylint: disable=too-many-locals
     def load_read_stats(self):
-        """Read reads for pool"""
-        filename = "/proc/spl/kstat/zfs/" + self.pool_name + "/reads"
-        with open(filename, "r", encoding="utf8") as read_stat_file:
-            read_stat_file.readline()
-            first = 0
-            dataset_map_cache = {}
-            pid_map = {}
-
+        """Read new reads for pool"""
+        self.reader.read()
+        first = self.reader.first_start()
+        if self.reader.last_uid() < self.last_uid:
+            # zfs module was reloaded and uids started from beginning
+            self.last_uid = 0
+
+        for line in self.reader.lines_after(self.last_uid):
+            array = line.split()
+            uid = int(array[0])
+            objset = array[2]
+            object_id = int(array[3])
+            aflags = int(array[6], 16)
+            pid = int(array[7])
+            process_name = " ".join(map(str, array[8:]))
+            self.last_uid = uid
+
+            dataset = self.get_dataset_by_id(objset)
+            if dataset is None:
+                continue
+            self.pid_map[pid] = process_name
+            self.add_record(uid, dataset.name, object_id, aflags, pid, process_name)
+        self.data_time_window = (time.time() * 1000 * 1000 * 1000 - self.shift) - first
+
+
+class ReadsKstatReader:
+    """Reader of pool reads kstat returning only lines not seen before
+
+    Whole kstat is read into reused buffer. Lines are ordered by uid, so first
+    unseen line is found by binary search and only lines after it are decoded.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.buffer = bytearray(READ_BUFFER_SIZE)
+        self.length = 0
+        self.data_start = 0
+
+    def read(self):
+        """Read actual content of kstat into buffer"""
+        length = 0
+        with open(self.filename, "rb", buffering=0) as kstat:
             while True:
-                line = read_stat_file.readline()
-                if line:
-                    array = line.split()
-                    uid = array[0]
-                    start = array[1]
-                    if first == 0:
-                        first = start
-                    objset = array[2]
-                    object_id = array[3]
-                    aflags = array[6]
-                    pid = array[7]
-                    process_name = " ".join(map(str, array[8:]))
-
-                    pid_map[pid] = process_name
-                    self.pid_map[pid] = process_name
-
-                    try:
-                        dataset_name = dataset_map_cache[objset]
-                    except KeyError:
-                        if self.get_dataset_by_id(objset) is not None:
-                            dataset_map_cache[objset] = self.get_dataset_by_id(objset).name
-                            dataset_name = dataset_map_cache[objset]
-                        else:
-                            continue
-
-                    read_stat = read_record_lib.ReadRecord(
-                        uid, objset, dataset_name, object_id, aflags, pid, process_name
-                    )
-
-                    if int(uid) > self.last_uid:
-                        self.history.add_node(read_stat)
-                        self.last_uid = int(uid)
-                else:
+                if length == len(self.buffer):
+                    self.buffer.extend(bytes(len(self.buffer)))
+                with memoryview(self.buffer) as view:
+                    with view[length:] as free_space:
+                        count = kstat.readinto(free_space)
+                if not count:
                     break
-            self.data_time_window = (time.time() * 1000 * 1000 * 1000 - self.shift) - int(first)
-            self.pid_map = pid_map
-            self.calculate_stats()
+                length += count
+        self.length = length
+        # skip header
+        self.data_start = self.buffer.find(b"\n", 0, length) + 1
+        if self.data_start == 0:
+            self.data_start = length
+
+    def field(self, line_start, index):
+        """Return field of line starting at line_start as int"""
+        line_end = self.line_end(line_start)
+        return int(self.buffer[line_start:line_end].split(None, index + 1)[index])
+
+    def line_end(self, line_start):
+        """Return end of line starting at line_start"""
+        line_end = self.buffer.find(b"\n", line_start, self.length)
+        if line_end == -1:
+            return self.length
+        return line_end
+
+    def last_line_start(self):
+        """Return start of last line"""
+        end = self.length
+        if end > self.data_start and self.buffer[end - 1] == ord("\n"):
+            end -= 1
+        return max(self.buffer.rfind(b"\n", self.data_start, end) + 1, self.data_start)
+
+    def first_start(self):
+        """Return start time of oldest read in kstat"""
+        if self.data_start >= self.length:
+            return 0
+        return self.field(self.data_start, 1)
+
+    def last_uid(self):
+        """Return uid of newest read in kstat"""
+        if self.data_start >= self.length:
+            return 0
+        return self.field(self.last_line_start(), 0)
+
+    def lines_after(self, last_uid):
+        """Return decoded lines with uid bigger than last_uid"""
+        low = self.data_start
+        high = self.length
+        while low < high:
+            middle = (low + high) // 2
+            line_start = self.buffer.rfind(b"\n", self.data_start, middle) + 1
+            line_start = max(line_start, self.data_start)
+            if self.field(line_start, 0) > last_uid:
+                high = line_start
+            else:
+                low = self.line_end(line_start) + 1
+        return self.buffer[low : self.length].decode("utf8", errors="replace").splitlines()
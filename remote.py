@@ -0,0 +1,640 @@
+"""Module sharing collected zfs state with viewers over unix socket
+
+Collector walks its Zfs object graph once every UPDATE_INTERVAL_SEC and
+broadcasts changes to all attached viewers, so attached viewer costs only
+sending of changes. New viewer gets whole state in its first frame.
+
+State is sent as JSON of plain data. Every object is separate entry keyed by
+its path from Zfs object, entry is sent again only when it changes. Values
+are JSON numbers, strings and lists, other containers are tagged:
+
+    {"d": [[key, value], ...]}  dict
+    {"t": [...]}                tuple
+    {"q": [...], "n": maxlen}   deque
+    {"s": [...]}                set
+    {"r": key}                  reference to entry
+
+Time series and read history entries carry only samples and reads added since
+previous frame, viewer keeps local copies of them. Viewer creates objects
+only of PASSIVE_CLASSES and never calls their constructors.
+
+Frame is 8 byte length followed by UTF-8 JSON object:
+
+    {"entries": {key: entry}, "removed": [key], "samples": {key: [count,
+    samples, reset]}, "reads": {key: [count, columns, dataset names, process
+    names, reset]}}
+
+or {"error": message} when collector can't send its state.
+"""
+
+import base64
+import importlib
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import collector_loop
+import reads_stats_history
+import time_series
+import zfs_lib
+
+UPDATE_INTERVAL_SEC = 1
+# time to get first frame, collector with big state needs time to send it
+ATTACH_TIMEOUT_SEC = 60
+# frames waiting for slow viewer, viewer is disconnected when they don't fit
+VIEWER_QUEUE_SIZE = 10
+FRAME_HEADER = struct.Struct("!Q")
+PEERCRED = struct.Struct("3i")
+
+# classes of state objects, their constructors are never called by viewer
+PASSIVE_CLASSES = {
+    "arc.Arc",
+    "arc_history.ArcHistory",
+    "collector_loop.TickStats",
+    "dataset_history.DatasetIOHistory",
+    "dataset_io.DatasetIO",
+    "dataset_io.PoolDatasetIO",
+    "dataset_lib.Dataset",
+    "event_log.EventLog",
+    "event_log.EventRecord",
+    "reads_stats_lib.PoolReadsStats",
+    "reads_stats_lib.ReadsStats",
+    "time_series.TimeSeriesGroup",
+    "txg_history.TxgHistory",
+    "txg_lib.Txg",
+    "txgs.Txgs",
+    "zpool_io.Device",
+    "zpool_io.DeviceInfo",
+    "zpool_io.DeviceIOStats",
+    "zpool_io.DeviceLatencyStats",
+    "zpool_io.DeviceSmartStats",
+    "zpool_io.PoolIO",
+    "zpool_io.PoolIOHistory",
+    "zpool_io.Raid",
+    "zpool_io.ZpoolWatcher",
+    "zpool_lib.Zpool",
+}
+ROOT = ""
+
+
+def peer_uid(connection):
+    """Return uid of process on other side of unix socket"""
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEERCRED.size)
+    return PEERCRED.unpack(credentials)[1]
+
+
+def is_trusted(connection):
+    """Check if other side is run by the same user or root"""
+    return peer_uid(connection) in (0, os.getuid())
+
+
+def class_name(obj):
+    """Return class of object as module.Name"""
+    return type(obj).__module__ + "." + type(obj).__qualname__
+
+
+def encode_bytes(data):
+    """Return bytes as JSON string"""
+    return base64.b64encode(data).decode("ascii")
+
+
+class StateEncoder:
+    """Encoder of Zfs object graph to entries of plain data
+
+    entries maps key to JSON of entry sent in previous frame, sent maps key of
+    time series or read history to the object and its count sent before.
+    Objects with version attribute are encoded again only when their version
+    changes, cache keeps their JSON and referenced objects. Entry of time
+    series or read history never changes, they are encoded once.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.entries = {}
+        self.sent = {}
+        # key: (object, version, JSON, [(key, object)] of references)
+        self.cache = {}
+        # entries, objects by id, histories and objects to encode of current walk
+        self.walk_entries = {}
+        self.keys = {}
+        self.histories = []
+        self.pending = deque()
+
+    def walk(self):
+        """Encode all objects reachable from root to walk_entries"""
+        self.walk_entries = {}
+        self.keys = {id(self.root): ROOT}
+        self.histories = []
+        self.pending = deque([(ROOT, self.root)])
+        cache = {}
+        while self.pending:
+            key, obj = self.pending.popleft()
+            if isinstance(obj, (time_series.TimeSeries, reads_stats_history.ReadsHistory)):
+                self.histories.append((key, obj))
+                version = 0
+            else:
+                version = getattr(obj, "version", None)
+            cached = self.cache.get(key)
+            if (
+                version is None
+                or cached is None
+                or cached[0] is not obj
+                or cached[1] != version
+                or not self.reuse(cached[3])
+            ):
+                references = []
+                entry = self.entry(key, obj, references)
+                cached = (obj, version, json.dumps(entry, separators=(",", ":")), references)
+            cache[key] = cached
+            self.walk_entries[key] = cached[2]
+        # objects of cache are kept alive, so ids in keys are not reused during walk
+        self.cache = cache
+
+    def reuse(self, references):
+        """Walk references of cached entry, return False when their keys changed"""
+        keys = self.keys
+        for key, obj in references:
+            known = keys.get(id(obj))
+            if known is None:
+                keys[id(obj)] = key
+                self.pending.append((key, obj))
+            elif known != key:
+                return False
+        return True
+
+    def entry(self, key, obj, references):
+        """Return entry of object, referenced objects are added to references"""
+        if isinstance(obj, time_series.TimeSeries):
+            tiers = None
+            if isinstance(obj, time_series.RollupSeries):
+                tiers = [
+                    [
+                        rollup.factor,
+                        rollup.min.size,
+                        self.reference(rollup.min, key + ".min" + str(index), references),
+                        self.reference(rollup.avg, key + ".avg" + str(index), references),
+                        self.reference(rollup.max, key + ".max" + str(index), references),
+                    ]
+                    for index, rollup in enumerate(obj.rollups)
+                ]
+            return {"c": "series", "size": obj.size, "typecode": obj.typecode, "tiers": tiers}
+        if isinstance(obj, reads_stats_history.ReadsHistory):
+            return {"c": "reads", "capacity": obj.capacity}
+        getstate = getattr(obj, "__getstate__", None)
+        state = getstate() if getstate is not None else obj.__dict__
+        values = {}
+        for name, value in list(dict(state or {}).items()):
+            values[name] = self.value(value, key + "." + name, references)
+        return {"c": class_name(obj), "v": values}
+
+    def reference(self, obj, path, references):
+        """Return key of object entry, object is encoded later"""
+        key = self.keys.get(id(obj))
+        if key is None:
+            key = path
+            self.keys[id(obj)] = key
+            self.pending.append((key, obj))
+        references.append((key, obj))
+        return key
+
+    # pylint: disable=too-many-return-statements
+    def value(self, value, path, references):
+        """Return value as plain data"""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, list):
+            return [
+                self.value(item, path + "[" + str(index) + "]", references)
+                for index, item in enumerate(list(value))
+            ]
+        if isinstance(value, dict):
+            return {
+                "d": [
+                    [
+                        self.value(key, path, references),
+                        self.value(item, path + "[" + repr(key) + "]", references),
+                    ]
+                    for key, item in list(value.items())
+                ]
+            }
+        if isinstance(value, tuple):
+            return {"t": self.value(list(value), path, references)}
+        if isinstance(value, deque):
+            return {"q": self.value(list(value), path, references), "n": value.maxlen}
+        if isinstance(value, (set, frozenset)):
+            return {"s": self.value(list(value), path, references)}
+        if isinstance(
+            value, (time_series.TimeSeries, reads_stats_history.ReadsHistory)
+        ) or class_name(value) in PASSIVE_CLASSES:
+            return {"r": self.reference(value, path, references)}
+        # collector runtime objects are not sent
+        return None
+
+    def frames(self, full):
+        """Return frame with changes since previous call and frame with whole state
+
+        Whole state is encoded only when full is True, otherwise it is None.
+        """
+        self.walk()
+        changed = {
+            key: entry for key, entry in self.walk_entries.items() if self.entries.get(key) != entry
+        }
+        removed = [key for key in self.entries if key not in self.walk_entries]
+        delta = {"samples": {}, "reads": {}}
+        whole = {"samples": {}, "reads": {}}
+        sent = {}
+        for key, history in self.histories:
+            since, version = 0, None
+            previous = self.sent.get(key)
+            # viewer forgets samples of other object at the same key
+            fresh = previous is None or previous[0] is not history
+            if not fresh:
+                _, since, version = previous
+                # most histories don't change between frames
+                unchanged = version == getattr(history, "names_version", None)
+                if not full and history.count == since and unchanged:
+                    sent[key] = previous
+                    continue
+            # whole history is copied once, changes are its end
+            if isinstance(history, time_series.TimeSeries):
+                section = "samples"
+                count, data = history.tail(0 if full else since)
+                itemsize = array(history.typecode).itemsize
+                length = min(count - since, len(data) // itemsize)
+                changes = [count, encode_bytes(data[len(data) - length * itemsize :])]
+                whole_item = [count, encode_bytes(data), True]
+            else:
+                section = "reads"
+                sent_version = version
+                # version is read before copy, tables changed during copy are sent again
+                version = history.names_version
+                count, columns = history.tail(0 if full else since)
+                length = min(count - since, len(columns[0]))
+                # names are read after reads, so they contain every name used by reads
+                names = [list(history.dataset_names), list(history.process_names)]
+                if history.names_version != version:
+                    version = None
+                changes = [
+                    count,
+                    [encode_bytes(column[len(column) - length :]) for column in columns],
+                ]
+                if version is None or version != sent_version:
+                    changes += names
+                else:
+                    changes += [None, None]
+                whole_item = [count, [encode_bytes(column) for column in columns]] + names + [True]
+            sent[key] = (history, count, version)
+            if fresh or count != since or (section == "reads" and changes[2] is not None):
+                delta[section][key] = changes + [fresh]
+            if full:
+                whole[section][key] = whole_item
+        self.entries = self.walk_entries
+        self.sent = sent
+        delta_frame = frame(changed, removed, delta)
+        if not full:
+            return delta_frame, None
+        return delta_frame, frame(self.entries, [], whole)
+
+
+def frame(entries, removed, histories):
+    """Return frame with encoded entries"""
+    body = (
+        '{"entries":{'
+        + ",".join(json.dumps(key) + ":" + entry for key, entry in entries.items())
+        + '},"removed":'
+        + json.dumps(removed)
+        + ',"samples":'
+        + json.dumps(histories["samples"])
+        + ',"reads":'
+        + json.dumps(histories["reads"])
+        + "}"
+    ).encode("utf8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def error_frame(message):
+    """Return frame telling viewer that collector can't send state"""
+    body = json.dumps({"error": message}).encode("utf8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+class Viewer:
+    """Attached viewer with its own sender thread
+
+    Frames are queued, so slow viewer doesn't delay others. Viewer which
+    doesn't read frames is disconnected.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.frames = queue.Queue(VIEWER_QUEUE_SIZE)
+        self.closed = False
+        threading.Thread(target=self.send_loop, daemon=True, name="StateSender").start()
+
+    def send(self, data):
+        """Queue frame for viewer"""
+        try:
+            self.frames.put_nowait(data)
+        except queue.Full:
+            self.close()
+
+    def close(self):
+        """Disconnect viewer after queued frames are sent"""
+        self.closed = True
+        try:
+            self.frames.put_nowait(None)
+        except queue.Full:
+            # sender fails to send queued frames and ends
+            self.connection.shutdown(socket.SHUT_RDWR)
+
+    def send_loop(self):
+        """Send queued frames until viewer disconnects"""
+        with self.connection:
+            while True:
+                data = self.frames.get()
+                if data is None:
+                    return
+                try:
+                    self.connection.sendall(data)
+                except OSError:
+                    self.closed = True
+                    return
+
+
+class Server:
+    """Unix socket server broadcasting zfs state to attached viewers"""
+
+    def __init__(self, zfs, path):
+        self.zfs = zfs
+        self.path = path
+        self.encoder = StateEncoder(zfs)
+        self.viewers = []
+        # viewers waiting for whole state
+        self.attached = []
+        self.lock = threading.Lock()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # only owner of collector can attach
+        umask = os.umask(0o177)
+        try:
+            self.socket.bind(path)
+        finally:
+            os.umask(umask)
+        self.socket.listen()
+        threading.Thread(target=self.accept_loop, daemon=True, name="StateServer").start()
+        threading.Thread(target=self.broadcast_loop, daemon=True, name="StateBroadcast").start()
+
+    def accept_loop(self):
+        """Accept viewers run by the same user or root"""
+        while True:
+            connection, _ = self.socket.accept()
+            try:
+                trusted = is_trusted(connection)
+            except OSError:
+                trusted = False
+            if not trusted:
+                connection.close()
+                continue
+            with self.lock:
+                self.attached.append(Viewer(connection))
+
+    def broadcast_loop(self):
+        """Periodicaly send changes of state to viewers"""
+        while True:
+            self.broadcast()
+            time.sleep(UPDATE_INTERVAL_SEC)
+
+    def broadcast(self):
+        """Send changes to attached viewers and whole state to new ones"""
+        with self.lock:
+            self.viewers = [viewer for viewer in self.viewers if not viewer.closed]
+            attached = self.attached
+            self.attached = []
+        if not self.viewers and not attached:
+            return
+        try:
+            delta, whole = self.encoder.frames(bool(attached))
+        except RuntimeError:
+            # collector changed container during walk, state is sent in next frame
+            with self.lock:
+                self.attached += attached
+            return
+        # pylint: disable=broad-except
+        except Exception as error:
+            # viewers are disconnected instead of waiting for state forever
+            message = error_frame("collector can't send state: " + repr(error))
+            for viewer in self.viewers + attached:
+                viewer.send(message)
+                viewer.close()
+            self.encoder = StateEncoder(self.zfs)
+            return
+        for viewer in self.viewers:
+            viewer.send(delta)
+        for viewer in attached:
+            viewer.send(whole)
+        with self.lock:
+            self.viewers += attached
+
+
+class StateDecoder:
+    """Decoder of frames updating local copies of collector objects
+
+    objects maps entry key to local object, root entry updates root object.
+    """
+
+    def __init__(self, root, local_attributes):
+        self.objects = {ROOT: root}
+        self.local_attributes = local_attributes
+
+    def apply(self, message):
+        """Update objects by decoded frame"""
+        if "error" in message:
+            raise EOFError(str(message["error"]))
+        entries = message["entries"]
+        # objects are created first, entries reference each other
+        for key, entry in entries.items():
+            self.create(key, entry)
+        for key, entry in entries.items():
+            if "v" not in entry:
+                continue
+            state = {name: self.value(value) for name, value in entry["v"].items()}
+            obj = self.objects[key]
+            if key == ROOT:
+                for name in self.local_attributes:
+                    state.pop(name, None)
+            obj.__dict__.update(state)
+        for key in message["removed"]:
+            if key != ROOT:
+                self.objects.pop(key, None)
+        for key, (count, data, reset) in message["samples"].items():
+            series = self.history(key, time_series.TimeSeries)
+            samples = array(series.typecode)
+            samples.frombytes(base64.b64decode(data))
+            series.sync(count, samples, reset)
+        for key, (_, data, dataset_names, process_names, reset) in message["reads"].items():
+            history = self.history(key, reads_stats_history.ReadsHistory)
+            if reset:
+                history.clear()
+            columns = []
+            for name, column_data in zip(reads_stats_history.COLUMNS, data):
+                column = array(getattr(history, name).typecode)
+                column.frombytes(base64.b64decode(column_data))
+                columns.append(column)
+            history.sync(columns, dataset_names, process_names)
+
+    def history(self, key, history_class):
+        """Return local copy of history with key"""
+        history = self.objects.get(key)
+        if not isinstance(history, history_class):
+            raise ValueError("unknown history " + key)
+        return history
+
+    def create(self, key, entry):
+        """Create local object for entry unless it already exists"""
+        kind = entry["c"]
+        obj = self.objects.get(key)
+        if kind == "series":
+            if (
+                isinstance(obj, time_series.TimeSeries)
+                and obj.size == entry["size"]
+                and obj.typecode == entry["typecode"]
+            ):
+                return
+            if entry["tiers"] is None:
+                obj = time_series.TimeSeries(entry["size"], entry["typecode"])
+            else:
+                obj = time_series.RollupSeries(
+                    entry["size"], entry["typecode"], tiers=[tier[0:2] for tier in entry["tiers"]]
+                )
+                # tiers are created by series, their entries reuse them
+                for rollup, tier in zip(obj.rollups, entry["tiers"]):
+                    self.objects[tier[2]] = rollup.min
+                    self.objects[tier[3]] = rollup.avg
+                    self.objects[tier[4]] = rollup.max
+        elif kind == "reads":
+            if isinstance(obj, reads_stats_history.ReadsHistory):
+                return
+            obj = reads_stats_history.ReadsHistory(entry["capacity"])
+        elif key == ROOT:
+            return
+        else:
+            if kind not in PASSIVE_CLASSES:
+                raise ValueError("class " + kind + " is not allowed")
+            if obj is not None and class_name(obj) == kind:
+                return
+            module, name = kind.split(".")
+            cls = getattr(importlib.import_module(module), name)
+            obj = cls.__new__(cls)
+        self.objects[key] = obj
+
+    # pylint: disable=too-many-return-statements
+    def value(self, value):
+        """Return value decoded from plain data"""
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if "r" in value:
+            return self.objects.get(value["r"])
+        if "d" in value:
+            return {self.value(key): self.value(item) for key, item in value["d"]}
+        if "t" in value:
+            return tuple(self.value(value["t"]))
+        if "q" in value:
+            return deque(self.value(value["q"]), value["n"])
+        if "s" in value:
+            return set(self.value(value["s"]))
+        raise ValueError("unknown value " + repr(value))
+
+
+class RemoteZfs(zfs_lib.Zfs):
+    """Zfs state received from collector process
+
+    Viewer runs no collectors, state is updated by every received frame.
+    Objects keep identity, so windows keep their sources. Snapshots are not
+    part of frames, viewer reads them itself when they are shown.
+    """
+
+    LOCAL_ATTRIBUTES = (
+        "socket",
+        "file",
+        "decoder",
+        "updates",
+        "executor",
+        "snapshot_cache",
+        "snapshot_loads",
+        "snapshot_lock",
+        "disconnected",
+    )
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        if not is_trusted(self.socket):
+            self.socket.close()
+            raise PermissionError("collector on " + path + " is run by other user")
+        self.socket.settimeout(ATTACH_TIMEOUT_SEC)
+        self.file = self.socket.makefile("rb")
+        self.decoder = StateDecoder(self, self.LOCAL_ATTRIBUTES)
+        self.updates = collector_loop.UpdateQueue()
+        self.executor = ThreadPoolExecutor(zfs_lib.LOAD_WORKERS, thread_name_prefix="Loader")
+        self.snapshot_cache = {}
+        self.snapshot_loads = {}
+        self.snapshot_lock = threading.Lock()
+        self.disconnected = None
+        self.update()
+        self.socket.settimeout(None)
+        threading.Thread(target=self.update_loop, daemon=True, name="StateReceiver").start()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.LOCAL_ATTRIBUTES:
+            del state[name]
+        return state
+
+    def update(self):
+        """Receive one frame and update state by it"""
+        header = self.file.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            raise EOFError("collector closed connection")
+        (length,) = FRAME_HEADER.unpack(header)
+        data = self.file.read(length)
+        if len(data) < length:
+            raise EOFError("collector closed connection")
+        try:
+            self.decoder.apply(json.loads(data))
+        except (KeyError, TypeError, AttributeError, ImportError) as error:
+            raise ValueError("invalid frame: " + repr(error)) from error
+        self.updates.notify()
+
+    def update_loop(self):
+        """Receive frames until collector disconnects
+
+        Reason of disconnection is kept in disconnected, UI shows state
+        received before as stale.
+        """
+        while True:
+            try:
+                self.update()
+            except (EOFError, OSError, ValueError) as error:
+                self.disconnected = "collector disconnected: " + str(error)
+                self.socket.close()
+                self.updates.notify()
+                return
+
+    def rescan_pools(self):
+        """Pools are rescanned by collector"""
+
+    def rescan_datasets(self):
+        """Datasets are rescanned by collector"""
@@ -9,7 +9,7 @@ import graphic
 
 
 # pylint: disable=too-many-instance-attributes
-class ScrollPad(graphic.Hideable, meta_selectable.MetaSelectable):
+class ScrollPad(graphic.Hideable, graphic.Damageable, meta_selectable.MetaSelectable):
     """Window with ability to scroll"""
 
     def __init__(self, s_r, s_c, size_r, size_c, w_size_r, w_size_c, autogrow=False):
@@ -176,9 +176,18 @@ class ScrollPad(graphic.Hideable, meta_selectable.MetaSelectable):
         if self.view_r < self.w_size_r:
             self.view_r = 0
 
+    def restore(self):
+        """Copy border and visible part of pad drawn before to screen again"""
+        self.border_window.touchwin()
+        self.window.touchwin()
+        self.refresh()
+
     def draw(self):
         """Draw scrollpad"""
         if self.is_visible():
+            if not self.is_damaged():
+                self.restore()
+                return
             self._draw()
             if self.is_selected():
                 self.border_window.attrset(curses.color_pair(graphic.COLOR_OK))
@@ -194,3 +203,76 @@ class ScrollPad(graphic.Hideable, meta_selectable.MetaSelectable):
     def get_pos(self):
         """Return position of top left corner"""
         return self.border_window.getbegyx()
+
+
+class ListPad(ScrollPad):
+    """Scroll pad drawing only rows of list which are in view
+
+    Pad is as big as inside of border window, so drawing cost doesn't depend
+    on length of list. size_r is virtual size of list and view_r is index of
+    the first shown row. Subclass returns number of rows by row_count and
+    draws one row to pad row by draw_row, header_rows on top don't scroll.
+    Rows are drawn in order after header, from view_r, until draw_row
+    returns 0 rows.
+    """
+
+    header_rows = 0
+
+    def __init__(self, s_r, s_c, size_c, w_size_r, w_size_c):
+        super().__init__(s_r, s_c, max(w_size_r - 2, 1), size_c, w_size_r, w_size_c)
+
+    @abc.abstractmethod
+    def row_count(self):
+        """Return number of rows of list"""
+
+    @abc.abstractmethod
+    def draw_row(self, row, index):
+        """Draw row of list with index to pad row, return number of used pad rows"""
+
+    def draw_header(self):
+        """Draw header rows"""
+
+    def _draw(self):
+        self.window.erase()
+        count = self.row_count()
+        self.size_r = max(self.header_rows + count + 2, self.w_size_r)
+        self.view_r = max(min(self.view_r, self.size_r - self.w_size_r), 0)
+        self.draw_header()
+        row = self.header_rows
+        index = self.view_r
+        while row < self.w_size_r - 2 and index < count:
+            try:
+                used = self.draw_row(row, index)
+            except curses.error:
+                # row doesn't fit to pad
+                break
+            # list is shorter than row_count said
+            if used == 0:
+                break
+            row += used
+            index += 1
+
+    def resize(self, s_r, s_c, w_size_r, w_size_c):
+        """Resize scrollpad, pad keeps only visible rows"""
+        super().resize(s_r, s_c, w_size_r, w_size_c)
+        self.size_c = max(self.size_c, w_size_c - 2)
+        try:
+            self.window.resize(max(w_size_r - 2, 1), self.size_c)
+        except curses.error:
+            pass
+
+    def refresh(self):
+        """Refresh border window and pad, pad holds only visible rows"""
+        self.border_window.noutrefresh()
+        try:
+            # can fail on window resize
+            self.window.noutrefresh(
+                0,
+                self.view_c,
+                self.s_r + 1,
+                self.s_c + 1,
+                self.s_r + self.w_size_r - 2,
+                self.s_c + self.w_size_c - 2,
+            )
+        except curses.error:
+            return
@@ -2,41 +2,125 @@
 
 import datetime
 import subprocess
+import sys
 import time
+from array import array
 
-# pylint: disable=too-few-public-methods
-class Snapshot:
-    """Class representing zfs snapshot"""
+# snapshot names passed to one zfs holds call
+HOLDS_BATCH_SIZE = 512
 
-    def __init__(self, parent, name, size, creation):
-        self.name = name
-        self.short_name = name.split("@")[1]
-        self.size = size
-        self.parent = parent
-        self.creation = creation
+
+class SnapshotTable:
+    """Snapshots of one dataset stored by columns
+
+    Row of snapshot is its index in names. Short names are interned, sizes
+    and creation times are int64 arrays, holds are stored only for rows
+    which have any. Creation time is formatted only when row is shown.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.used = array("q")
+        self.creation = array("q")
+        # {tag: timestamp} by row
         self.holds = {}
-        self.creation_human = datetime.datetime.fromtimestamp(int(creation)).strftime(
-            "%b %d %H:%M %Y"
-        )
+        self.max_name_length = 0
 
-    def get_holds(self):
-        """Read holds for snapshot"""
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, short_name, used, creation):
+        """Add snapshot and return its row"""
+        self.names.append(sys.intern(short_name))
+        self.used.append(used)
+        self.creation.append(creation)
+        self.max_name_length = max(self.max_name_length, len(short_name))
+        return len(self.names) - 1
+
+    def add_hold(self, row, tag, timestamp):
+        """Add hold of snapshot in row"""
         try:
-            output = subprocess.run(
-                ["/sbin/zfs", "holds", "-H", self.name],
-                stdout=subprocess.PIPE,
-                text=True,
-                check=True,
-                env={"LC_TIME": "c"},
-            )
-            if output.stdout != "":
-                for line in output.stdout.splitlines():
-                    self.parent.has_holds = True
-                    tag = line.split("\t")[1]
-                    creation_time = line.split("\t")[2]
-                    timestamp = time.mktime(
-                        datetime.datetime.strptime(creation_time, "%a %b %d %H:%M %Y").timetuple()
-                    )
-                    self.holds[tag] = int(timestamp)
-        except subprocess.CalledProcessError:
-            return
+            self.holds[row][tag] = timestamp
+        except KeyError:
+            self.holds[row] = {tag: timestamp}
+
+    def has_holds(self):
+        """Return True if any snapshot has hold"""
+        return bool(self.holds)
+
+    def creation_human(self, row):
+        """Return formatted creation time of snapshot in row"""
+        return datetime.datetime.fromtimestamp(self.creation[row]).strftime("%b %d %H:%M %Y")
+
+
+def read_snapshots(dataset_name):
+    """Read snapshots of one dataset with their holds to SnapshotTable
+
+    Holds of all snapshots with user references are read by batched zfs
+    holds calls.
+    """
+    snapshots = SnapshotTable()
+    # rows of snapshots with user references by full name
+    held = {}
+    with subprocess.Popen(
+        [
+            "zfs",
+            "list",
+            "-Hpo",
+            "name,used,creation,userrefs",
+            "-t",
+            "snapshot",
+            "-d",
+            "1",
+            dataset_name,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ) as process:
+        # stream output, listing of big dataset is not kept in memory
+        for line in process.stdout:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 4:
+                continue
+            name, used, creation, userrefs = fields
+            row = snapshots.append(name.split("@", 1)[1], int(used), int(creation))
+            if int(userrefs) > 0:
+                held[name] = row
+    names = list(held)
+    for start in range(0, len(names), HOLDS_BATCH_SIZE):
+        read_holds(snapshots, held, names[start : start + HOLDS_BATCH_SIZE])
+    return snapshots
+
+
+def read_holds(snapshots, held, names):
+    """Read holds of snapshots with full names to table, held maps names to rows
+
+    When batch fails, usually because one snapshot was destroyed after
+    listing, it is split and halves are read again, so only holds of
+    missing snapshots are lost.
+    """
+    try:
+        output = subprocess.run(
+            ["/sbin/zfs", "holds", "-H"] + names,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True,
+            env={"LC_TIME": "c"},
+        )
+    except subprocess.CalledProcessError:
+        if len(names) > 1:
+            half = len(names) // 2
+            read_holds(snapshots, held, names[:half])
+            read_holds(snapshots, held, names[half:])
+        return
+    for line in output.stdout.splitlines():
+        name, tag, creation_time = line.split("\t")[0:3]
+        row = held.get(name)
+        if row is None:
+            continue
+        timestamp = time.mktime(
+            datetime.datetime.strptime(creation_time, "%a %b %d %H:%M %Y").timetuple()
+        )
+        snapshots.add_hold(row, tag, int(timestamp))
@@ -1,21 +1,59 @@
-"""Module for time series graph"""
+"""Module for time series graph
+
+Samples are array views of history, they are scaled to bar heights by map
+over whole view, so per sample work is done in C. Bars are built as column
+strings which are transposed to rows by zip. Graph is drawn row by row,
+every row is split to runs of cells with the same attribute and each run is
+written by one addstr call.
+"""
 
 import curses
+import functools
+import math
+import operator
+import re
+from itertools import islice, repeat
+
 import graphic
 import utils
 import color
 
+# eighths of cell, used for bars when TimeGraph.blocks is enabled
+BLOCKS = " \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+# cell not covered by any bar, it is not written
+EMPTY = "\0"
+BAR_RUN = re.compile("_+|[^\0_]+")
+COLOR_RUN = re.compile(r"([^\0])\1*")
+# color pairs of bars as (block characters, spaces), zoomed graph shows avg
+# bar over max envelope and min envelope over avg bar
+AVG_COLORS = (graphic.COLOR_FG_WHITE, graphic.COLOR_BCK_WHITE)
+MAX_COLORS = (graphic.COLOR_FG_CYAN, graphic.COLOR_BCK_CYAN)
+MIN_COLORS = (graphic.COLOR_FG_BLUE, graphic.COLOR_BCK_BLUE)
+
+
 # pylint: disable=too-many-instance-attributes
 class TimeGraph(graphic.GraphicObject):
-    """Class for time graph"""
+    """Class for time graph
 
-    def __init__(self, s_r, s_c, size_r, size_c, values, zoom=1):
+    With blocks enabled bars have resolution of eighth of cell, terminal must
+    use UTF-8. Zoomed graph shows consolidated tier of history, every column
+    shows min, avg and max of samples of one tier sample, so spikes are not
+    lost.
+    """
+
+    blocks = False
+
+    def __init__(self, s_r, s_c, size_r, size_c, values, zoom=0):
         self.window = curses.newwin(size_r, size_c, s_r, s_c)
         self.size_r = size_r
         self.size_c = size_c
         self.window.border()
         self.values = values
+        # history tier shown, 0 is raw series
         self.zoom = zoom
+        self.level = 0
+        # (min, max) samples of shown tier, None for raw series
+        self.envelope = None
         self.size = size_c - 2
         self.target = 0
         self.target_char = "_"
@@ -35,6 +73,10 @@ class TimeGraph(graphic.GraphicObject):
         """Change graph source"""
         self.values = source
 
+    def damage_key(self):
+        """Graph changes when sample is appended to source"""
+        return (self.values, self.values.count)
+
     def set_target(self, value):
         """Highlight target values"""
         self.target = value
@@ -69,15 +111,16 @@ class TimeGraph(graphic.GraphicObject):
 
     def print_x_info(self, length, scale_reservation):
         """Print descriptions on x scale"""
+        coef = self.x_scale_coef * self.values.factor(self.level)
         self.window.addstr(
             self.size_r - 2,
             scale_reservation + 1,
-            self.x_scale_funct(str(-length * self.x_scale_coef)),
+            self.x_scale_funct(str(-length * coef)),
         )
         self.window.addstr(
             self.size_r - 2,
             scale_reservation + (self.size_c - scale_reservation) // 2,
-            self.x_scale_funct(str(-length * self.x_scale_coef // 2)),
+            self.x_scale_funct(str(-length * coef // 2)),
         )
         self.window.addstr(
             self.size_r - 2, self.size_c - 1 - len(self.x_scale_funct("0")), self.x_scale_funct("0")
@@ -89,56 +132,121 @@ class TimeGraph(graphic.GraphicObject):
 
     def get_max(self, values):
         """Get max_value in input queue"""
-        __max = 0
-        for item in values:
-            if int(item) > __max:
-                __max = int(item)
-        __max = max(__max, self.target)
-        return __max
+        return max(int(max(values, default=0)), 0, self.target)
+
+    # pylint: disable=no-self-use
+    def sample_count(self, values):
+        """Return number of samples in values returned by zoom_data"""
+        return len(values)
 
     def zoom_in(self):
-        """Zoom graph"""
-        if self.zoom < 3:
-            self.zoom += 1
+        """Zoom graph, show finer history tier"""
+        if self.zoom > 0:
+            self.zoom -= 1
 
     def zoom_out(self):
-        """Zoom out graph"""
-        if self.zoom > 1:
-            self.zoom -= 1
+        """Zoom out graph, show coarser history tier"""
+        if self.zoom < self.values.levels() - 1:
+            self.zoom += 1
 
     def zoom_data(self):
-        """Zoom data according to zoom"""
-        tmp_values = list(self.values)
-        values = tmp_values[len(tmp_values) - self.size_c : len(tmp_values)]
-        return values
-
-    def draw_column(self, height, col):
-        """Draw graph column"""
-        if height != self.size_r - self.scale_shift:
-            for i in range(height + 1, self.size_r + 1 - self.scale_shift):
-                try:
-                    self.window.addstr(i, col, " ", curses.color_pair(100))
-                except curses.error:
-                    continue
-        else:
-            self.window.addch(self.size_r - self.scale_shift, col, "_")
+        """Return samples of history tier selected by zoom fitting to graph columns
+
+        Tiers are consolidated when samples are collected, envelope is set to
+        min and max samples of the same tier.
+        """
+        self.level = min(self.zoom, self.values.levels() - 1)
+        self.envelope = None
+        if self.level > 0:
+            self.envelope = (
+                self.values.select(self.level, "min").last(self.size_c),
+                self.values.select(self.level, "max").last(self.size_c),
+            )
+        return self.values.select(self.level).last(self.size_c)
+
+    # pylint: disable=too-many-arguments
+    def add_runs(self, row, col, line, pattern, attr_funct, fill=None):
+        """Write runs of row line found by pattern, skip empty cells
+
+        Run is written as it is or, if fill is set, as fill character.
+        """
+        for run in pattern.finditer(line):
+            text = run.group()
+            if fill is not None:
+                text = fill * len(text)
+            try:
+                self.window.addstr(row, col + run.start(), text, attr_funct(run.group()))
+            except curses.error:
+                continue
 
-    def empty_column(self, col):
-        """Draw empty column"""
-        for i in range(1, self.size_r - self.scale_shift):
-            self.window.addstr(i, col, " ")
+    def bar_attr(self, colors, run):
+        """Return attribute of bar run, zero values are shown as underscore"""
+        if run[0] == "_":
+            return curses.A_NORMAL
+        if self.blocks:
+            return curses.color_pair(colors[0])
+        return curses.color_pair(colors[1])
+
+    def bar_column(self, sample, height, bottom, zero):
+        """Return cells of bar from bottom, height is in eighths of cell
+
+        Zero sample is shown as zero character.
+        """
+        if sample < 0:
+            return EMPTY * bottom
+        if height == 0:
+            return zero.ljust(bottom, EMPTY)
+        if self.blocks:
+            full, part = divmod(height, 8)
+            cells = BLOCKS[8] * full + BLOCKS[part].strip()
+        else:
+            cells = " " * (height // 8)
+        return cells[:bottom].ljust(bottom, EMPTY)
+
+    def bar_heights(self, samples, max_value):
+        """Return iterator of bar heights in eighths of cell"""
+        rows = self.size_r - 1 - self.scale_shift
+        if self.blocks:
+            return map(math.ceil, map(operator.mul, samples, repeat(rows * 8 / max_value)))
+        # cells of bar rounded up as in rows of graph
+        tops = map(
+            int,
+            map(
+                operator.sub,
+                repeat(self.size_r),
+                map(operator.truediv, map(operator.mul, samples, repeat(rows)), repeat(max_value)),
+            ),
+        )
+        return map(operator.mul, map(operator.sub, repeat(self.size_r), tops), repeat(8))
 
     def process_data(self, values, max_value, scale_reservation):
-        """Process all source and print colums"""
-        col = self.size_c - 2
-        values.reverse()
-        for item in values:
-            row = self.size_r - (item * (self.size_r - 1 - self.scale_shift) / max_value) + 0
-            if int(item) >= 0:
-                self.draw_column(int(row) - self.scale_shift, col)
-            col -= 1
-            if col <= scale_reservation:
-                break
+        """Process all source and print columns row by row"""
+        count = min(len(values), self.size_c - 2 - scale_reservation)
+        if count <= 0:
+            return
+        first_col = self.size_c - 1 - count
+        if self.envelope is None:
+            self.draw_bars(values[len(values) - count :], max_value, first_col, AVG_COLORS, "_")
+            return
+        low, high = self.envelope
+        self.draw_bars(high[len(high) - count :], max_value, first_col, MAX_COLORS, EMPTY)
+        self.draw_bars(values[len(values) - count :], max_value, first_col, AVG_COLORS, "_")
+        self.draw_bars(low[len(low) - count :], max_value, first_col, MIN_COLORS, EMPTY)
+
+    # pylint: disable=too-many-arguments
+    def draw_bars(self, samples, max_value, first_col, colors, zero):
+        """Draw bars of samples from first_col, row by row"""
+        bottom = self.size_r - self.scale_shift
+        columns = map(
+            self.bar_column,
+            samples,
+            self.bar_heights(samples, max_value),
+            repeat(bottom),
+            repeat(zero),
+        )
+        attr_funct = functools.partial(self.bar_attr, colors)
+        for level, cells in enumerate(zip(*columns)):
+            self.add_runs(bottom - level, first_col, "".join(cells), BAR_RUN, attr_funct)
 
     # pylint: disable=too-many-nested-blocks
     def _draw(self):
@@ -146,7 +254,10 @@ class TimeGraph(graphic.GraphicObject):
         self.window.border()
         self.window.noutrefresh()
         values = self.zoom_data()
-        max_value = self.get_max(values)
+        if self.envelope is None:
+            max_value = self.get_max(values)
+        else:
+            max_value = self.get_max(self.envelope[1])
 
         scale_reservation = len(str(self.function(max_value))) + 2
 
@@ -199,7 +310,7 @@ class TimeGraph(graphic.GraphicObject):
 
         if self.x_scale:
             self.print_x_scale()
-            self.print_x_info(len(values), scale_reservation)
+            self.print_x_info(self.sample_count(values), scale_reservation)
             self.window.addch(self.size_r - 3, scale_reservation, 110, curses.A_ALTCHARSET)
         self.window.noutrefresh()
 
@@ -207,7 +318,7 @@ class TimeGraph(graphic.GraphicObject):
 class TimeGraphMulti(TimeGraph):
     """Class for time graph"""
 
-    def __init__(self, s_r, s_c, size_r, size_c, values, zoom=1):
+    def __init__(self, s_r, s_c, size_r, size_c, values, zoom=0):
         self.palette = (
             color.COLOR_BCK_RED,
             color.COLOR_BCK_BLUE,
@@ -218,39 +329,47 @@ class TimeGraphMulti(TimeGraph):
         )
         super().__init__(s_r, s_c, size_r, size_c, values, zoom)
 
+    def zoom_data(self):
+        """Return samples of every series of tier selected by zoom"""
+        self.level = min(self.zoom, self.values.levels() - 1)
+        return [series.last(self.size_c) for series in self.values.select(self.level).series]
+
+    def sample_count(self, values):
+        """Return number of samples of one series"""
+        return len(values[0])
+
     def get_max(self, values):
-        """Get max_value in input queue"""
-        max_val = 0
-        for item in values:
-            val_sum = 0
-            for val in item:
-                val_sum += int(val)
-            if val_sum > max_val:
-                max_val = val_sum
-        max_val = max(max_val, self.target)
-        return max_val
-
-    def draw_column(self, height, col, col_color, inc=0):
-        """Draw graph column"""
-        for i in range(0, height):
-            try:
-                self.window.addstr(self.size_r - self.scale_shift - i - inc, col, " ", col_color)
-            except curses.error:
-                continue
+        """Get max_value of stacked samples"""
+        totals = functools.reduce(lambda total, series: map(operator.add, total, series), values)
+        return max(int(max(totals, default=0)), 0, self.target)
 
     def process_data(self, values, max_value, scale_reservation):
-        col = self.size_c - 2
-        values.reverse()
-        for item in values:
-            inc = 0
-            i = 0
-            for val in item:
-                row = (val * (self.size_r - self.scale_shift) / max_value) + 0
-                if int(val) >= 0:
-                    self.draw_column(int(row) + 0, col, curses.color_pair(self.palette[i]), inc)
-                    inc += int(row) + 0
-                i += 1
-
-            col -= 1
-            if col <= scale_reservation:
-                break
+        """Process all source and print stacked columns row by row"""
+        count = min(len(values[0]), self.size_c - 2 - scale_reservation)
+        if count <= 0:
+            return
+        first_col = self.size_c - 1 - count
+        bottom = self.size_r - self.scale_shift
+        # palette indexes of column cells from bottom, missing samples are skipped
+        stacks = repeat("")
+        for i, series in enumerate(values):
+            samples = series[len(series) - count :]
+            cells = map(
+                int,
+                map(
+                    operator.truediv,
+                    map(operator.mul, map(max, samples, repeat(0)), repeat(bottom)),
+                    repeat(max_value),
+                ),
+            )
+            stacks = map(operator.add, stacks, map(operator.mul, repeat(str(i)), cells))
+        columns = map(str.ljust, stacks, repeat(bottom), repeat(EMPTY))
+        # stacks of samples bigger than max_value are cut at top of graph
+        for level, cells in enumerate(islice(zip(*columns), bottom)):
+            self.add_runs(
+                bottom - level, first_col, "".join(cells), COLOR_RUN, self.palette_attr, " "
+            )
+
+    def palette_attr(self, run):
+        """Return attribute of run of one series"""
+        return curses.color_pair(self.palette[int(run[0])])
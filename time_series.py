@@ -0,0 +1,345 @@
+"""Module for fixed size numeric time series"""
+
+from array import array
+
+import history_store
+
+MISSING = -1
+
+# consolidated tiers as (raw samples per tier sample, tier size), with 1 s
+# sampling tiers are 10 s, 30 s, 1 min and 10 min covering 1 h, 3 h, 6 h and
+# 60 h, hour of samples fits to 120 columns of 30 s tier
+ROLLUP_TIERS = ((10, 360), (30, 360), (60, 360), (600, 360))
+
+
+class TimeSeries:
+    """Fixed size history of numeric samples
+
+    Samples are stored in typed array used as ring buffer, initialy filled by
+    MISSING. Indexing and iteration go from the oldest sample to the newest one,
+    same as with deque used before.
+
+    Named series are attached to tracks of history store when store is open.
+    Interval in seconds between samples is used to fill samples missed while
+    viewer was not running, 0 means series is not sampled periodicaly.
+    """
+
+    def __init__(self, size, typecode="q", name=None, interval=0):
+        self.size = size
+        self.typecode = typecode
+        self.interval = interval
+        self.data = array(typecode, [MISSING]) * size
+        # number of appended samples, changes with every append
+        self.count = 0
+        self.track = None
+        history_store.register(self, name, self.layout())
+
+    def layout(self):
+        """Return (size, typecode, interval) of tracks kept in history store"""
+        return [(self.size, self.typecode, self.interval)]
+
+    def bind(self, track):
+        """Use track of history store as sample buffer"""
+        self.track = track
+        self.data = track.data
+        self.count = track.count()
+        # sample at count position could be written without count commit
+        self.data[self.count % self.size] = MISSING
+
+    def attach(self, tracks):
+        """Use tracks of history store, fill samples missed while not running"""
+        gap = tracks[0].gap()
+        self.bind(tracks[0])
+        self.pad(gap)
+
+    def __len__(self):
+        return self.size
+
+    def head(self):
+        """Return position of the oldest sample in data"""
+        return self.count % self.size
+
+    def append(self, value):
+        """Add new sample, overwrite the oldest one"""
+        self.data[self.count % self.size] = value
+        self.count += 1
+        if self.track is not None:
+            self.track.commit(self.count)
+
+    def tail(self, since):
+        """Return count and bytes of samples appended after since samples
+
+        Samples can be appended by other thread, so they are copied again when
+        count changes during copy. Oldest sample is never copied, it is the
+        one which is overwritten before count changes.
+        """
+        while True:
+            count = self.count
+            length = min(count, self.size - 1)
+            if since <= count:
+                length = min(count - since, length)
+            end = (count - 1) % self.size + 1
+            start = end - length
+            if start >= 0:
+                samples = bytes(self.data[start:end])
+            else:
+                samples = bytes(self.data[start:]) + bytes(self.data[:end])
+            if self.count == count:
+                return count, samples
+
+    def sync(self, count, samples, reset=False):
+        """Set newest samples received from other process
+
+        Series has count samples after sync, samples end with the newest one.
+        Samples received before are forgotten when reset is True or when some
+        samples were not received.
+        """
+        if reset or count - len(samples) > self.count:
+            self.data = array(self.typecode, [MISSING]) * self.size
+        self.count = count - len(samples)
+        for value in samples:
+            TimeSeries.append(self, value)
+
+    def pad(self, count):
+        """Append count missing samples"""
+        for _ in range(0, min(count, self.size)):
+            TimeSeries.append(self, MISSING)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("time series index out of range")
+        return self.data[(self.head() + index) % self.size]
+
+    def __iter__(self):
+        return iter(self.last(self.size))
+
+    def __reversed__(self):
+        return reversed(self.last(self.size))
+
+    # pylint: disable=no-self-use
+    def levels(self):
+        """Return number of resolution levels"""
+        return 1
+
+    def factor(self, level):  # pylint: disable=unused-argument
+        """Return raw samples per one sample of level"""
+        return 1
+
+    def select(self, level, kind="avg"):  # pylint: disable=unused-argument
+        """Return series of level, level 0 is raw series"""
+        return self
+
+    def last(self, length):
+        """Return last length samples, the oldest first
+
+        Returned memoryview shares memory with series when window does not wrap
+        around end of buffer, otherwise window is copied to new array.
+        """
+        length = max(min(length, self.size), 0)
+        end = (self.count - 1) % self.size + 1
+        start = end - length
+        if start >= 0:
+            return memoryview(self.data)[start:end]
+        window = array(self.typecode, self.data[start:])
+        window.extend(self.data[:end])
+        return window
+
+
+def restore_state(track, state):
+    """Return state saved in track, new track is initialized by state"""
+    if track.count() == 0:
+        track.data[:] = state
+        track.commit(1)
+    return track.data
+
+
+# indexes of Rollup counters and values
+SLOTS, SAMPLES = 0, 1
+TOTAL, LOW, HIGH = 0, 1, 2
+
+
+class Rollup:
+    """One consolidated tier of time series
+
+    Every factor raw samples are consolidated into one sample of min, avg and
+    max series. Missing samples are skipped, tier sample is missing only when
+    all consolidated samples are missing. State of unfinished tier sample is
+    kept in arrays, so it is stored in history store together with tiers.
+    """
+
+    def __init__(self, factor, size, typecode):
+        self.factor = factor
+        self.min = TimeSeries(size, typecode)
+        self.avg = TimeSeries(size, "d")
+        self.max = TimeSeries(size, typecode)
+        # consumed raw samples and not missing ones
+        self.counters = array("q", [0, 0])
+        # total, min and max of not missing samples
+        self.values = array(typecode, [0, MISSING, MISSING])
+
+    def layout(self):
+        """Return layout of tracks of tiers and state"""
+        layout = self.min.layout() + self.avg.layout() + self.max.layout()
+        return layout + [(len(self.counters), "q", 0), (len(self.values), self.values.typecode, 0)]
+
+    def attach(self, tracks):
+        """Use tracks of history store for tiers and state"""
+        self.min.bind(tracks[0])
+        self.avg.bind(tracks[1])
+        self.max.bind(tracks[2])
+        self.counters = restore_state(tracks[3], self.counters)
+        self.values = restore_state(tracks[4], self.values)
+
+    def add(self, value):
+        """Add raw sample, store consolidated sample after factor samples"""
+        counters = self.counters
+        if value != MISSING:
+            values = self.values
+            if counters[SAMPLES] == 0:
+                values[LOW] = value
+                values[HIGH] = value
+            elif value < values[LOW]:
+                values[LOW] = value
+            elif value > values[HIGH]:
+                values[HIGH] = value
+            counters[SAMPLES] += 1
+            values[TOTAL] += value
+        counters[SLOTS] += 1
+        if counters[SLOTS] >= self.factor:
+            self.store()
+
+    def store(self):
+        """Append consolidated sample and start new one"""
+        counters = self.counters
+        values = self.values
+        if counters[SAMPLES]:
+            self.min.append(values[LOW])
+            self.avg.append(values[TOTAL] / counters[SAMPLES])
+            self.max.append(values[HIGH])
+        else:
+            self.min.append(MISSING)
+            self.avg.append(MISSING)
+            self.max.append(MISSING)
+        counters[SLOTS] = 0
+        counters[SAMPLES] = 0
+        values[TOTAL] = 0
+
+    def pad(self, count):
+        """Add count missing raw samples"""
+        first = self.factor - self.counters[SLOTS]
+        if count < first:
+            self.counters[SLOTS] += count
+            return
+        self.store()
+        count -= first
+        self.min.pad(count // self.factor)
+        self.avg.pad(count // self.factor)
+        self.max.pad(count // self.factor)
+        self.counters[SLOTS] = count % self.factor
+
+
+class RollupSeries(TimeSeries):
+    """Time series keeping consolidated tiers of older samples
+
+    Raw samples are kept only for size samples, tiers keep min, avg and max
+    of longer intervals RRD-style in fixed memory.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, size, typecode="q", name=None, interval=0, tiers=ROLLUP_TIERS):
+        # tiers exist before series is attached, they are in the same segment
+        self.rollups = [Rollup(factor, tier_size, typecode) for factor, tier_size in tiers]
+        super().__init__(size, typecode, name, interval)
+
+    def layout(self):
+        """Return layout of tracks of raw series, tiers and their state"""
+        layout = super().layout()
+        for rollup in self.rollups:
+            layout += rollup.layout()
+        return layout
+
+    def attach(self, tracks):
+        """Use tracks of history store, fill samples missed while not running"""
+        gap = tracks[0].gap()
+        self.bind(tracks[0])
+        start = 1
+        for rollup in self.rollups:
+            end = start + len(rollup.layout())
+            rollup.attach(tracks[start:end])
+            start = end
+        self.pad(gap)
+
+    def append(self, value):
+        """Add new sample to raw series and all tiers"""
+        super().append(value)
+        for rollup in self.rollups:
+            rollup.add(value)
+
+    def pad(self, count):
+        """Append count missing samples to raw series and all tiers"""
+        super().pad(count)
+        for rollup in self.rollups:
+            rollup.pad(count)
+
+    def levels(self):
+        """Return number of resolution levels, raw series included"""
+        return len(self.rollups) + 1
+
+    def factor(self, level):
+        """Return raw samples per one sample of level"""
+        if level == 0:
+            return 1
+        return self.rollups[level - 1].factor
+
+    def select(self, level, kind="avg"):
+        """Return series of level, level 0 is raw series
+
+        kind selects min, avg or max series of consolidated tier.
+        """
+        if level == 0:
+            return self
+        return getattr(self.rollups[level - 1], kind)
+
+
+class TimeSeriesGroup:
+    """Several time series appended together, samples are tuples"""
+
+    # series are created once, state sharing encodes object only once
+    version = 0
+
+    def __init__(self, series):
+        self.series = series
+
+    def __len__(self):
+        return len(self.series[0])
+
+    def __iter__(self):
+        return zip(*self.series)
+
+    @property
+    def count(self):
+        """Number of appended samples"""
+        return self.series[0].count
+
+    def append(self, values):
+        """Add one sample to every series"""
+        for series, value in zip(self.series, values):
+            series.append(value)
+
+    def levels(self):
+        """Return number of resolution levels common for all series"""
+        return min(series.levels() for series in self.series)
+
+    def factor(self, level):
+        """Return raw samples per one sample of level"""
+        return self.series[0].factor(level)
+
+    def select(self, level, kind="avg"):
+        """Return group of series of level"""
+        return TimeSeriesGroup([series.select(level, kind) for series in self.series])
+
+    def last(self, length):
+        """Return last length samples as list of tuples, the oldest first"""
+        return list(zip(*(series.last(length) for series in self.series)))
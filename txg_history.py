@@ -1,6 +1,7 @@
 """Module for historic records for txgs"""
 
-from collections import deque
+import history_store
+import time_series
 import utils
 
 COLLECTED_DATA = [
@@ -57,11 +58,18 @@ CONVERT_MAP = {
 class TxgHistory:
     """Pool txg history"""
 
-    def __init__(self):
+    # series are created once, state sharing encodes object only once
+    version = 0
+
+    def __init__(self, pool_name):
         self.stats = {}
-        for param in ["time"] + COLLECTED_DATA:
-            init_list = [-1] * MAX_RECORDS
-            self.stats[param] = deque(init_list, maxlen=MAX_RECORDS)
+        self.stats["time"] = time_series.TimeSeries(MAX_RECORDS)
+        with history_store.group("pool." + pool_name + ".txg"):
+            for param in COLLECTED_DATA:
+                # txgs are not periodic, missed txgs are not filled on start
+                self.stats[param] = time_series.RollupSeries(
+                    MAX_RECORDS, name="pool." + pool_name + ".txg." + param
+                )
 
     def add_node(self, txg):
         """Add new txg record"""
@@ -1,8 +1,5 @@
 """Module for reading txgs stats"""
 
-import threading
-import time
-
 import txg_lib
 import txg_history
 
@@ -10,21 +7,17 @@ import txg_history
 class Txgs:
     """Class for reading txfs stats"""
 
-    def __init__(self, pool_name):
+    def __init__(self, pool_name, loop):
         self.__pool_name = pool_name
-        self.history = txg_history.TxgHistory()
+        self.history = txg_history.TxgHistory(pool_name)
         self.last_txg = 0
-        self.init_txg_stats()
-
-    def init_txg_stats(self):
-        """Fork thread to read txgs"""
-        threading.Thread(target=self.txg_stats_loop, daemon=True, name="TxgReader").start()
+        self.init_txg_stats(loop)
 
-    def txg_stats_loop(self):
-        """Periodicaly collect stats"""
-        while True:
-            self.load_txgs()
-            time.sleep(txg_history.COLLECT_INTERVAL_SEC)
+    def init_txg_stats(self, loop):
+        """Periodicaly collect stats in collector loop"""
+        self.timer = loop.add_timer(
+            txg_history.COLLECT_INTERVAL_SEC, self.load_txgs, name=self.__pool_name + " txgs"
+        )
 
     # pylint: disable=too-many-locals
     def load_txgs(self):
@@ -1,5 +1,7 @@
 """Helper utils, usually to convert units"""
 
+import datetime
+
 VALID_NUMBERS = 3
 
 
@@ -39,6 +41,11 @@ def convert_count(size):
     return str(round(size, round_size)) + units[index]
 
 
+def convert_timestamp(timestamp):
+    """Convert unix timestamp to time of day"""
+    return datetime.datetime.fromtimestamp(int(timestamp)).strftime("%H:%M:%S")
+
+
 def add_percent(input_string):
     """Add percent sign to input"""
     return str(input_string) + "%"
@@ -2,13 +2,17 @@
 
 import subprocess
 import curses
-import threading
-import time
 import datetime
+import threading
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+import collector_loop
 import zpool_lib
+import zpool_io
 import arc
+import dataset_lib
+import history_store
 import snapshot_lib
 
 
@@ -17,18 +21,63 @@ FRAGMENTATION_LIMIT_ERR = 70
 FREEING_LIMIT = 1073741824
 CAPACITY_LIMIT_WARN = 85
 CAPACITY_LIMIT_ERR = 92
+LOAD_WORKERS = 8
+RESCAN_INTERVAL_SEC = 60
 
 
 class Zfs:
-    """Class representing zfs subsystem"""
+    """Class representing zfs subsystem
+
+    Pools are created as placeholders and loaded by worker threads, so UI can
+    start before all pools are read. generation is increased every time a
+    pool is loaded or datasets are added or removed by rescan, UI rereads
+    pools and datasets when it changes.
+    """
 
     def __init__(self):
         self.zpools = {}
         self.log = deque(maxlen=100)
+        # number of dbgmsg lines added to log
+        self.log_count = 0
+        self.generation = 0
+        self.generation_lock = threading.Lock()
+        self.loop = collector_loop.CollectorLoop()
+        self.updates = self.loop.updates
+        self.tick_stats = self.loop.tick_stats
+        self.executor = ThreadPoolExecutor(LOAD_WORKERS, thread_name_prefix="Loader")
+        self.snapshot_cache = {}
+        # load token by dataset name, result of forgotten load is dropped
+        self.snapshot_loads = {}
+        self.snapshot_lock = threading.Lock()
+        self.rescan_lock = threading.Lock()
         self.init_pools()
-        self.read_snapshots()
+        self.iostat = zpool_io.IostatCollector(self, self.loop)
         self.init_dbgmsg()
-        self.arc = arc.Arc()
+        self.loop.add_timer(
+            RESCAN_INTERVAL_SEC, self.submit_rescan, RESCAN_INTERVAL_SEC, "datasets rescan"
+        )
+        self.arc = arc.Arc(self.loop)
+        self.loop.start()
+
+    # reason why state is no longer updated, only remote state can be disconnected
+    disconnected = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # collector runtime, not needed by viewer
+        for name in [
+            "loop",
+            "iostat",
+            "updates",
+            "executor",
+            "generation_lock",
+            "rescan_lock",
+            "snapshot_cache",
+            "snapshot_loads",
+            "snapshot_lock",
+        ]:
+            state.pop(name, None)
+        return state
 
     # pylint: disable=no-self-use
     def read_pools(self):
@@ -39,48 +88,34 @@ class Zfs:
             ).stdout.splitlines()
             return pools
         except subprocess.CalledProcessError:
-            curses.ungetch("q")
-            return None
-
-    def read_snapshots(self):
-        """Get snapshots for dataset"""
-        try:
-            output = subprocess.run(
-                ["zfs", "list", "-Hpo", "name,used,creation,userrefs", "-t", "snapshot"],
-                stdout=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-            if output.stdout != "":
-                for line in output.stdout.splitlines():
-                    data = line.split("\t")
-                    name = data[0]
-                    used = data[1]
-                    creation = data[2]
-                    userrefs = data[3]
-                    dataset_name = data[0].split("@")[0]
-                    short_name = data[0].split("@")[1]
-                    pool_name = line.split("/")[0].split('@')[0]
-                    self.zpools[pool_name].datasets[dataset_name].snapshot[
-                        short_name
-                    ] = snapshot_lib.Snapshot(
-                        self.zpools[pool_name].datasets[dataset_name], name, used, creation
-                    )
-                    if int(userrefs) > 0:
-                        try:
-                            self.zpools[pool_name].datasets[dataset_name].snapshot[
-                                short_name
-                            ].get_holds()
-                        except KeyError:
-                            pass
-        except subprocess.CalledProcessError:
-            return
+            try:
+                curses.ungetch("q")
+            except curses.error:
+                # running without user interface
+                pass
+            return []
 
     def init_pools(self):
-        """Create Zpool class for every pool"""
+        """Create Zpool class for every pool and start loading it"""
         for line in self.read_pools():
-            pool = zpool_lib.Zpool(line)
-            self.zpools[line] = pool
+            self.zpools[line] = self.new_pool(line)
+
+    def new_pool(self, name):
+        """Create placeholder pool loaded by worker thread"""
+        pool = zpool_lib.Zpool(name, self.loop)
+        self.executor.submit(self.load_pool, pool)
+        return pool
+
+    def load_pool(self, pool):
+        """Load pool, runs in worker thread"""
+        pool.load(self.loop)
+        self.next_generation()
+
+    def next_generation(self):
+        """Tell UI that pools or datasets changed"""
+        with self.generation_lock:
+            self.generation += 1
+        self.updates.notify()
 
     def get_pools(self):
         """Return list of pools"""
@@ -89,8 +124,9 @@ class Zfs:
     def get_datasets(self):
         """Return list of datasets"""
         datasets = []
-        for pool in self.zpools.values():
-            for dataset in pool.datasets.values():
+        for pool in list(self.zpools.values()):
+            # pools are loaded by worker threads
+            for dataset in list(pool.datasets.values()):
                 datasets += [dataset.name]
         return datasets
 
@@ -101,8 +137,47 @@ class Zfs:
             if line in self.zpools:
                 new_zpools[line] = self.zpools[line]
             else:
-                new_zpools[line] = zpool_lib.Zpool(line)
+                new_zpools[line] = self.new_pool(line)
+        removed = [pool for name, pool in self.zpools.items() if name not in new_zpools]
         self.zpools = new_zpools
+        for pool in removed:
+            pool.close(self.loop)
+            pool.drop_history()
+
+    def submit_rescan(self):
+        """Rescan datasets in worker thread, collector loop doesn't wait for zfs"""
+        self.executor.submit(self.rescan_datasets)
+
+    def rescan_datasets(self):
+        """Add new and remove destroyed datasets of loaded pools
+
+        Names and objsetids of all datasets are listed by one zfs call and
+        diffed against datasets of pools, only changed datasets are rebuilt.
+        Pools which are still loading read all datasets themselves.
+        """
+        with self.rescan_lock:
+            listed = dataset_lib.list_datasets()
+            if listed is None:
+                return
+            changed = []
+            for pool in list(self.zpools.values()):
+                if pool.loaded and pool.name in listed:
+                    changed += pool.update_datasets(listed[pool.name])
+            with self.snapshot_lock:
+                for name in changed:
+                    self.snapshot_cache.pop(name, None)
+                    self.snapshot_loads.pop(name, None)
+            if changed:
+                self.next_generation()
+            # all history objects exist when all pools are loaded
+            if all(pool.loaded for pool in self.zpools.values()):
+                history_store.prune()
+
+    def forget_snapshots(self):
+        """Drop cached snapshots, they are read again when shown"""
+        with self.snapshot_lock:
+            self.snapshot_cache.clear()
+            self.snapshot_loads.clear()
 
     def dataset_by_name(self, name):
         """Return dataset object identified by dataset name"""
@@ -110,32 +185,33 @@ class Zfs:
         return self.zpools[pool_name].datasets[name]
 
     def init_dbgmsg(self):
-        """Run thread to read dbgmsg log"""
-        threading.Thread(target=self.__dbgmsg_loop, daemon=True, name="Dbgmsg").start()
-
-    def __dbgmsg_loop(self):
-        last_valid_line = ""
-        is_open = True
-        while True:
-            with open("/proc/spl/kstat/zfs/dbgmsg", "r", encoding="utf8") as dbgmsg:
-                dbgmsg.readline()
-                while True:
-                    line = dbgmsg.readline()
-                    if line and is_open:
-                        timestamp = line.split()[0]
-                        payload = line[len(timestamp) + 1 :]
-                        time_string = datetime.datetime.fromtimestamp(int(timestamp)).strftime(
-                            "%H:%M:%S"
-                        )
-                        self.log.appendleft(str(time_string) + str(payload))
-                        last_line = line
-                    if line == last_valid_line:
-                        is_open = True
-                    if not line:
-                        last_valid_line = last_line
-                        is_open = False
-                        time.sleep(1)
-                        break
+        """Read dbgmsg log every second in collector loop"""
+        self.dbgmsg_last_line = ""
+        self.dbgmsg_is_open = True
+        self.loop.add_timer(1, self.read_dbgmsg, name="dbgmsg")
+
+    def read_dbgmsg(self):
+        """Add dbgmsg lines after last line seen in previous read to log"""
+        last_line = self.dbgmsg_last_line
+        with open("/proc/spl/kstat/zfs/dbgmsg", "r", encoding="utf8") as dbgmsg:
+            dbgmsg.readline()
+            while True:
+                line = dbgmsg.readline()
+                if line and self.dbgmsg_is_open:
+                    timestamp = line.split()[0]
+                    payload = line[len(timestamp) + 1 :]
+                    time_string = datetime.datetime.fromtimestamp(int(timestamp)).strftime(
+                        "%H:%M:%S"
+                    )
+                    self.log.appendleft(str(time_string) + str(payload))
+                    self.log_count += 1
+                    last_line = line
+                if line == self.dbgmsg_last_line:
+                    self.dbgmsg_is_open = True
+                if not line:
+                    self.dbgmsg_last_line = last_line
+                    self.dbgmsg_is_open = False
+                    break
 
     def zfs_reads_arc(self):
         """Check if logging arc hits is enabled"""
@@ -145,38 +221,38 @@ class Zfs:
             value = read_history_hits_file.read(1)
         return bool(int(value))
 
-    def snapshot_by_name(self, name):
-        """Return snapshot object by name"""
-        dataset = name.split("@")[0]
-        snapshot = name.split("@")[1]
-        return self.dataset_by_name(dataset).get_snapshot(snapshot)
+    def snapshots(self, dataset_name):
+        """Return SnapshotTable of dataset, None while it is loading
+
+        Snapshots are read by worker thread when dataset is shown first time,
+        loaded snapshots are cached.
+        """
+        with self.snapshot_lock:
+            try:
+                return self.snapshot_cache[dataset_name]
+            except KeyError:
+                self.snapshot_cache[dataset_name] = None
+            token = object()
+            self.snapshot_loads[dataset_name] = token
+        self.executor.submit(self.load_snapshots, dataset_name, token)
+        return None
+
+    def load_snapshots(self, dataset_name, token):
+        """Read snapshots of dataset to cache, runs in worker thread
 
-    def read_holds(self):
-        """Find snapshots with userrefs and than read holds for that snapshots"""
+        Snapshots which can't be read are cached as empty table, they are read
+        again after forget_snapshots. Snapshots of load started before
+        forget_snapshots are dropped.
+        """
         try:
-            output = subprocess.run(
-                ["zfs", "get", "-Hpo", "name,value", "userrefs", "-t", "snapshot"],
-                stdout=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-            if output.stdout != "":
-                for line in output.stdout.splitlines():
-                    name = line.split("\t")[0]
-                    count = line.split("\t")[1]
-                    if int(count) > 0:
-                        self.snapshot_by_name(name).get_holds()
-        except subprocess.CalledProcessError:
-            return
-
-
-# todo:
-#    def rescan_datasets(self):
-#        new_datasets = list()
-#        for pool in self.zpools.keys():
-#            for dataset in self.zpools[pool].datasets.values():
-#                if dataset in pool[
-#                datasets += [dataset.name]
-##                if i == 1:
-##                    return datasets
-#        return datasets
+            snapshots = snapshot_lib.read_snapshots(dataset_name)
+        # pylint: disable=broad-except
+        except Exception:
+            snapshots = snapshot_lib.SnapshotTable()
+        with self.snapshot_lock:
+            if self.snapshot_loads.get(dataset_name) is not token:
+                return
+            del self.snapshot_loads[dataset_name]
+            self.snapshot_cache[dataset_name] = snapshots
+        self.updates.notify()
+
@@ -2,10 +2,17 @@
 
 """Main app module"""
 
+import argparse
 import curses
+import functools
+import locale
 import signal
+import sys
 
 import graphic
+import history_store
+import remote
+import time_graph
 import zfs_lib
 import gui
 import pool_window
@@ -22,7 +29,7 @@ class Program:
     """Main class representing program"""
 
     # pylint: disable=too-many-instance-attributes
-    def __init__(self, screen):
+    def __init__(self, screen, zfs_factory=zfs_lib.Zfs):
         signal.signal(signal.SIGINT, self.signal_handler_preinit)
         self.stdscr = screen
         graphic.GraphicObject.init_colors()
@@ -37,7 +44,8 @@ class Program:
                 curses.ungetch("q")
                 return
         curses.halfdelay(10)
-        self.zfs = zfs_lib.Zfs()
+        self.zfs = zfs_factory()
+        self.generation = self.zfs.generation
         self.window_map = {}
         self.window_map["pools"] = pool_window.PoolWindow(self.stdscr, self.zfs)
         self.window_map["datasets"] = dataset_window.DatasetWindow(self.stdscr, self.zfs)
@@ -106,10 +114,21 @@ class Program:
         while True:
             char = self.stdscr.getch()
             if char == -1:
+                if self.zfs.disconnected is not None and self.time_window.status is None:
+                    self.time_window.status = "Disconnected"
+                    self.time_window.draw()
+                if self.generation != self.zfs.generation:
+                    self.generation = self.zfs.generation
+                    for window in self.window_map.values():
+                        window.update_sources()
+                    self.resize()
+                    continue
                 if self.is_size_ok():
                     self.time_window.refresh()
-                    self.selected_window().draw()
-                    self.selected_window().refresh()
+                    # redraw only when collectors have new data
+                    if self.zfs.updates.has_updates():
+                        self.selected_window().draw_damaged()
+                        self.selected_window().refresh()
                     curses.doupdate()
                 continue
             if char == curses.KEY_RIGHT:
@@ -148,16 +167,94 @@ class Program:
             curses.doupdate()
 
 
-def main_stage2(stdscr):
+def main_stage2(stdscr, zfs_factory):
     """Main function"""
-    program = Program(stdscr)
+    program = Program(stdscr, zfs_factory)
     program.main_screen()
 
 
+def start_collectors(args):
+    """Create Zfs with running collectors, serve it to viewers if requested"""
+    zfs = zfs_lib.Zfs()
+    if args.listen:
+        remote.Server(zfs, args.listen)
+    return zfs
+
+
+def run_headless(args):
+    """Run collectors without curses until interrupted
+
+    Samples are written to history store or sent to viewers attached to socket.
+    """
+    zfs = start_collectors(args)
+    zfs.loop.report = report
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            signal.pause()
+    except KeyboardInterrupt:
+        pass
+
+
+def report(message):
+    """Print problem of collector while curses is not running"""
+    print("zfs_viewer: " + message, file=sys.stderr)
+
+
 # wrapper restore original terminal settings
 def main():
     """Main"""
-    curses.wrapper(main_stage2)
+    parser = argparse.ArgumentParser(description="Interactive viewer of ZFS statistics")
+    parser.add_argument(
+        "--history-dir",
+        help="keep history of graphs in memory mapped files in directory across restarts",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="only collect history to --history-dir or for --listen, without user interface",
+    )
+    parser.add_argument("--listen", metavar="SOCKET", help="serve collected state on unix socket")
+    parser.add_argument(
+        "--connect", metavar="SOCKET", help="show state of collector listening on unix socket"
+    )
+    parser.add_argument(
+        "--blocks",
+        action="store_true",
+        help="draw graphs with unicode block characters, terminal must use UTF-8",
+    )
+    args = parser.parse_args()
+    if args.headless and not (args.history_dir or args.listen):
+        parser.error("--headless requires --history-dir or --listen")
+    if args.connect and (args.headless or args.listen or args.history_dir):
+        parser.error("--connect can't be combined with collector options")
+    store = None
+    if args.history_dir:
+        store = history_store.open_store(args.history_dir)
+        if args.headless and not store.writable:
+            sys.exit("zfs_viewer: history in " + args.history_dir + " is written by other process")
+    if args.headless:
+        if store is not None:
+            store.report = report
+        run_headless(args)
+        return
+    if args.blocks:
+        locale.setlocale(locale.LC_ALL, "")
+        if locale.getpreferredencoding(False) != "UTF-8":
+            parser.error("--blocks requires UTF-8 locale")
+        time_graph.TimeGraph.blocks = True
+    if args.connect:
+        try:
+            zfs = remote.RemoteZfs(args.connect)
+        except (OSError, EOFError, ValueError) as error:
+            sys.exit("zfs_viewer: can't attach to collector: " + str(error))
+        curses.wrapper(main_stage2, lambda: zfs)
+        if zfs.disconnected is not None:
+            report(zfs.disconnected)
+    else:
+        curses.wrapper(main_stage2, functools.partial(start_collectors, args))
+    if store is not None and store.failures:
+        report(str(store.failures) + " history segments were not mapped, " + store.last_error)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,18 @@
 """Module for collecting pool IO."""
 
 import subprocess
-import threading
-import time
-import os
-from collections import deque
 
+import history_store
+import iostat_backend
+import time_series
 
 RAID_TYPE = ["raidz", "raidz1", "raidz2", "raidz3", "mirror", "stripe"]
 VDEV_TYPE = ["cache", "logs", "special", "spare", "data"]
 
 MAX_SAMPLES = 300
+COLLECT_INTERVAL_SEC = 5
+IOSTAT_LATENCY_INTERVAL_SEC = 10
+LATENCY_PARAMS = ["r_tw", "w_tw", "r_dw", "w_dw", "r_sw", "w_sw", "r_aw", "w_aw", "s_w", "t_w"]
 
 
 class Device:
@@ -127,24 +129,45 @@ class Raid:
         return io_stats
 
 
+def history_series(name):
+    """Create pool io history series"""
+    return time_series.RollupSeries(MAX_SAMPLES, "q", name, COLLECT_INTERVAL_SEC)
+
+
 # pylint: disable=too-few-public-methods
 class PoolIOHistory:
     """Class storing pool io history records
 
-    History is represented as queue of fixed length, initialy filled by -1.
-    When new data are loaded from iostat thread, new values are appended to queues
+    History is represented as time series of fixed length, initialy filled by -1,
+    with consolidated tiers of older samples.
+    When new data are loaded from iostat thread, new values are appended to series
     """
 
-    def __init__(self):
-        init_list = [-1] * MAX_SAMPLES
+    # series are created once, state sharing encodes object only once
+    version = 0
+
+    def __init__(self, pool_name):
         self.physical_io_stats = {}
         self.logical_io_stats = {}
         self.latency_stats = {}
-        for param in ["r_c", "w_c", "t_c", "r_b", "w_b", "t_b"]:
-            self.physical_io_stats[param] = deque(init_list, maxlen=MAX_SAMPLES)
-            self.logical_io_stats[param] = deque(init_list, maxlen=MAX_SAMPLES)
-        for param in ["r_tw", "r_dw", "r_sw", "r_aw", "w_tw", "w_dw", "w_sw", "w_aw", "s_w", "t_w"]:
-            self.latency_stats[param] = deque(init_list, maxlen=MAX_SAMPLES)
+        prefix = "pool." + pool_name + "."
+        with history_store.group(prefix + "io"):
+            for param in ["r_c", "w_c", "t_c", "r_b", "w_b", "t_b"]:
+                self.physical_io_stats[param] = history_series(prefix + "physical." + param)
+                self.logical_io_stats[param] = history_series(prefix + "logical." + param)
+            for param in [
+                "r_tw",
+                "r_dw",
+                "r_sw",
+                "r_aw",
+                "w_tw",
+                "w_dw",
+                "w_sw",
+                "w_aw",
+                "s_w",
+                "t_w",
+            ]:
+                self.latency_stats[param] = history_series(prefix + "latency." + param)
 
 
 # pylint: disable=too-many-instance-attributes
@@ -168,9 +191,8 @@ class PoolIO:
         self.device_io_stats_physical = DeviceIOStats()
         self.device_io_stats = self.device_io_stats_logical
         self.device_latency_stats = DeviceLatencyStats()
-        self.history = PoolIOHistory()
+        self.history = PoolIOHistory(name)
         self.device_io_new_data = False
-        self.read_topology()
 
     def save_io_stats(self):
         """Save pool IO to history queue"""
@@ -346,16 +368,127 @@ class PoolIO:
             self.device_io_stats = self.device_io_stats_logical
 
 
+class IostatCollector:
+    """Class running zpool iostat processes shared by all pools
+
+    Every process prints rows of all pools, pool row selects ZpoolWatcher
+    receiving following rows. zfs is object with zpools dictionary.
+    Pool IO rows come from the first working backend of iostat_backend.
+    """
+
+    def __init__(self, zfs, loop):
+        self.zfs = zfs
+        self.loop = loop
+        self.io_watcher = None
+        self.latency_watcher = None
+        self.histogram = [""]
+        self.backends = []
+        self.init_watchers()
+
+    def init_watchers(self):
+        """Register iostat processes in collector loop"""
+        self.loop.call_soon(self.start_backends)
+        iostat_backend.add_iostat_process(
+            self.loop,
+            ["-vHPL", "-c", "iostat-10s,temp", str(IOSTAT_LATENCY_INTERVAL_SEC)],
+            self.latency_line,
+            interval=IOSTAT_LATENCY_INTERVAL_SEC,
+            name="pools latency",
+        )
+        iostat_backend.add_iostat_process(
+            self.loop,
+            ["-r", str(COLLECT_INTERVAL_SEC)],
+            self.histogram_line,
+            interval=COLLECT_INTERVAL_SEC,
+            name="pools histograms",
+        )
+
+    def watcher(self, name):
+        """Return watcher of pool or None if name is not pool"""
+        pool = self.zfs.zpools.get(name)
+        if pool is None:
+            return None
+        return pool.zpool_io_watcher
+
+    def pool_names(self):
+        """Return names of watched pools"""
+        return list(self.zfs.zpools)
+
+    def start_backends(self):
+        """Open IO backends in loop thread and start the preferred one"""
+        self.backends = iostat_backend.open_backends(COLLECT_INTERVAL_SEC)
+        self.start_next_backend()
+
+    def start_next_backend(self):
+        """Start next IO backend after previous one failed"""
+        self.io_watcher = None
+        if self.backends:
+            self.backends.pop(0).start(self, self.loop)
+
+    def io_line(self, out):
+        """Pass row of zpool iostat -vHPLlp to watcher of its pool
+
+        Return result of watcher, None when row has no watcher.
+        """
+        self.io_watcher = self.watcher(out[0]) or self.io_watcher
+        if self.io_watcher is None:
+            return None
+        return self.io_watcher.io_line(out)
+
+    def io_histograms(self, name, histograms):
+        """Pass latency histograms of vdev to watcher of current pool"""
+        if self.io_watcher is not None:
+            self.io_watcher.latency_histograms[name] = histograms
+
+    def flush_io(self):
+        """Save IO of all pools collected in last interval"""
+        for pool in list(self.zfs.zpools.values()):
+            pool.zpool_io_watcher.flush_io()
+
+    def latency_line(self, line):
+        """Pass line of latency zpool iostat to watcher of its pool"""
+        if len(line) > 3:
+            out = line.split()
+            self.latency_watcher = self.watcher(out[0]) or self.latency_watcher
+            if self.latency_watcher is not None:
+                self.latency_watcher.latency_line(out)
+
+    def histogram_line(self, line):
+        """Collect line of zpool iostat -r
+
+        Histogram of every pool starts by line with pool name and ends by
+        separator line.
+        """
+        if "-----------------------------" in line:
+            self.save_histogram(self.histogram)
+            self.histogram = [""]
+        else:
+            self.histogram.append(line)
+
+    def save_histogram(self, histogram):
+        """Pass histogram to watcher of pool named in its first line"""
+        for line in histogram:
+            if line.split():
+                watcher = self.watcher(line.split()[0])
+                if watcher is not None:
+                    watcher.histogram = histogram
+                return
+
+
 class ZpoolWatcher:
-    """Class running collecting threads"""
+    """Class processing collected stats of one pool
+
+    Rows of pool are passed to handlers by IostatCollector.
+    """
 
     def __init__(self, name, devices, raids, pool_io):
         self.pool_name = name
         self.pool_io = pool_io
         self.raids = raids
         self.devices = devices
-        self.init_zpool_watcher()
         self.histogram = ["Collecting"]
+        # latency histograms of last interval by vdev name, if backend provides them
+        self.latency_histograms = {}
 
     def get_raid_by_name(self, name):
         """Return Raid object by name"""
@@ -365,192 +498,97 @@ class ZpoolWatcher:
                     return raid
         return None
 
-    def start_watchers(self):
-        """Start collecting threads"""
-        self.init_zpool_io_watcher()
-        self.init_zpool_latency_watcher()
-        self.init_zpool_histogram_watcher()
-        self.get_smart()
-
-    def init_zpool_watcher(self):
-        """Fork collecting threads outside of main thread"""
-        threading.Thread(target=self.start_watchers, daemon=True, name="WatcherStarter").start()
-
-    def init_zpool_io_watcher(self):
-        """Start pool IO collecting thread"""
-        threading.Thread(target=self.zpool_io_watcher, daemon=True, name="ZpoolIOWatcher").start()
-
-    def init_zpool_latency_watcher(self):
-        """Start pool latency collecting thread"""
-        threading.Thread(
-            target=self.zpool_latency_watcher, daemon=True, name="ZpoolLatencyWatcher"
-        ).start()
-
-    def init_zpool_histogram_watcher(self):
-        """Start pool histogram collecting thread"""
-        threading.Thread(
-            target=self.zpool_histogram_watcher, daemon=True, name="ZpoolHistogramWatcher"
-        ).start()
-
-    def init_smart(self):
-        """Fork thread to collect smart"""
-        threading.Thread(target=self.get_smart, daemon=True, name="Smart").start()
-
-    def zpool_io_watcher(self):
-        """IO and capacity collecting thread"""
-        with subprocess.Popen(
-            ["/sbin/zpool", "iostat", "-vHPLlp", self.pool_name, "5"],
-            bufsize=1,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            encoding="utf-8",
-            errors="replace",
+    def init_smart(self, loop):
+        """Collect smart in collector loop"""
+        loop.run_command(
+            [
+                "/sbin/zpool",
+                "iostat",
+                "-vHPL",
+                self.pool_name,
+                "-c",
+                "smart,smartx,realloc,serial,vendor,media,size,model",
+            ],
+            self.get_smart,
             env={"ZPOOL_SCRIPTS_AS_ROOT": "yes"},
-        ) as process:
-            os.set_blocking(process.stdout.fileno(), False)
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    time.sleep(5)
-                if not line:
-                    self.pool_io.calc_pool_io("logical")
-                    self.pool_io.save_io_stats()
-                    time.sleep(5)
-                if line:
-                    if len(line) > 3:
-                        out = line.split()
-                        name = out[0].replace("-part1", "")
-
-                        c_u = out[1]
-                        c_f = out[2]
-                        r_c = out[3]
-                        w_c = out[4]
-                        r_b = out[5]
-                        w_b = out[6]
-
-                        if name[0] != "/":
-                            raid = self.get_raid_by_name(name)
-                            if raid is not None:
-                                target = raid
-                            else:
-                                target = self.pool_io
-                            target.device_io_stats.set_capacity_stats(c_u, c_f)
-
-                            index = 7
-                            for param in [
-                                "r_tw",
-                                "w_tw",
-                                "r_dw",
-                                "w_dw",
-                                "r_sw",
-                                "w_sw",
-                                "r_aw",
-                                "w_aw",
-                                "s_w",
-                                "t_w",
-                            ]:
-                                target.device_latency_stats.stat[param] = out[index]
-                                index += 1
-                            if raid is None:
-                                target.save_latency_stats()
-                                target.device_io_new_data = True
-                            continue
-
-                        index = 7
-                        for param in [
-                            "r_tw",
-                            "w_tw",
-                            "r_dw",
-                            "w_dw",
-                            "r_sw",
-                            "w_sw",
-                            "r_aw",
-                            "w_aw",
-                            "s_w",
-                            "t_w",
-                        ]:
-                            self.devices[name].device_latency_stats.stat[param] = out[index]
-                            index += 1
-
-                        self.devices[name].device_io_stats.set_io_stats(r_c, w_c, r_b, w_b)
-                        self.devices[name].device_io_stats.set_capacity_stats(c_u, c_f)
-
-    def zpool_latency_watcher(self):
-        """Latency collecting thread"""
-        with subprocess.Popen(
-            ["/sbin/zpool", "iostat", "-vHPL", "-c", "iostat-10s,temp", self.pool_name, "10"],
-            bufsize=1,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            encoding="utf-8",
-            errors="replace",
-            env={"ZPOOL_SCRIPTS_AS_ROOT": "yes"},
-        ) as process:
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    time.sleep(5)
-                if line:
-                    if len(line) > 3:
-                        out = line.split()
-                        name = out[0]
-
-                        if name[0] != "/":
-                            continue
-
-                        util = out[-2]
-                        temp = out[-1]
-
-                        if util == "-":
-                            util = "?"
-                        if len(out) > 9:
-                            self.devices[name].device_io_stats.util = util
-                        self.devices[name].smart_stats.temp = temp
-
-    def zpool_histogram_watcher(self):
-        """IO histogram collecting thread"""
-        with subprocess.Popen(
-            ["/sbin/zpool", "iostat", "-r", self.pool_name, "5"],
-            bufsize=1,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            encoding="utf-8",
-            errors="replace",
-            env={"ZPOOL_SCRIPTS_AS_ROOT": "yes"},
-        ) as process:
-            histogram = [""]
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    self.histogram = histogram
-                    time.sleep(5)
-                if line:
-                    if "-----------------------------" in line:
-                        self.histogram = histogram
-                        histogram = [""]
-                    else:
-                        histogram.append(line)
-
-    def get_smart(self):
-        """Read smart for devices"""
-        try:
-            output = subprocess.run(
-                [
-                    "/sbin/zpool",
-                    "iostat",
-                    "-vHPL",
-                    self.pool_name,
-                    "-c",
-                    "smart,smartx,realloc,serial,vendor,media,size,model",
-                ],
-                stdout=subprocess.PIPE,
-                text=True,
-                check=True,
-                env={"ZPOOL_SCRIPTS_AS_ROOT": "yes"},
-            )
-        except subprocess.CalledProcessError:
+        )
+
+    def flush_io(self):
+        """Save IO collected in last interval to history"""
+        self.pool_io.calc_pool_io("logical")
+        self.pool_io.save_io_stats()
+
+    def io_line(self, out):
+        """Process row of zpool iostat -vHPLlp
+
+        Return True when row belongs to topology, False for unknown device and
+        None while topology is not read.
+        """
+        name = out[0].replace("-part1", "")
+
+        c_u = out[1]
+        c_f = out[2]
+        r_c = out[3]
+        w_c = out[4]
+        r_b = out[5]
+        w_b = out[6]
+
+        if name[0] != "/":
+            raid = self.get_raid_by_name(name)
+            if raid is not None:
+                target = raid
+            else:
+                target = self.pool_io
+            target.device_io_stats.set_capacity_stats(c_u, c_f)
+
+            index = 7
+            for param in LATENCY_PARAMS:
+                target.device_latency_stats.stat[param] = out[index]
+                index += 1
+            if raid is None:
+                target.save_latency_stats()
+                target.device_io_new_data = True
+            return True
+
+        device = self.devices.get(name)
+        if device is None:
+            if not self.devices:
+                return None
+            # device added after topology was read
+            return False
+        index = 7
+        for param in LATENCY_PARAMS:
+            device.device_latency_stats.stat[param] = out[index]
+            index += 1
+
+        device.device_io_stats.set_io_stats(r_c, w_c, r_b, w_b)
+        device.device_io_stats.set_capacity_stats(c_u, c_f)
+        return True
+
+    def latency_line(self, out):
+        """Process row of zpool iostat -vHPL -c iostat-10s,temp"""
+        name = out[0]
+
+        if name[0] != "/":
+            return
+        device = self.devices.get(name)
+        if device is None:
             return
-        for line in output.stdout.splitlines():
+
+        util = out[-2]
+        temp = out[-1]
+
+        if util == "-":
+            util = "?"
+        if len(out) > 9:
+            device.device_io_stats.util = util
+        device.smart_stats.temp = temp
+
+    def get_smart(self, returncode, output, _):
+        """Read smart for devices from output of zpool iostat"""
+        if returncode != 0:
+            return
+        for line in output.splitlines():
             if len(line) > 3:
                 out = line.split()
                 name = out[0].replace("-part1", "")
@@ -563,6 +601,8 @@ class ZpoolWatcher:
                     if raid is not None:
                         raid.device_io_stats.set_capacity_stats(c_u, c_f)
                     continue
+                if name not in self.devices:
+                    continue
                 device = self.devices[name].smart_stats
 
                 index = 7
@@ -559,8 +559,8 @@ class ZpoolIOWindow(app_window.AppWindow):
             self.active_menu.move_right()
             self.set_time_graph_source()
             self.set_correct_covert_funct()
-        #        if chr(char) == '+':
-        #            self.time_graph.zoom_in()
-        #        if chr(char) == '-':
-        #            self.time_graph.zoom_out()
+        if chr(char) == "+":
+            self.time_graph.zoom_in()
+        if chr(char) == "-":
+            self.time_graph.zoom_out()
         self.draw()
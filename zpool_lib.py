@@ -1,66 +1,152 @@
 """Module for zpool"""
 
 import subprocess
-import threading
 import re
 
 import dataset_lib
+import dataset_io
 import event_log
+import history_store
 import zpool_io
 import txgs
 import reads_stats_lib
 
+PROPERTIES = [
+    "health",
+    "size",
+    "capacity",
+    "dedupratio",
+    "allocated",
+    "free",
+    "fragmentation",
+    "autotrim",
+    "freeing",
+    "checkpoint",
+    "readonly",
+]
+NUMERIC_PROPERTIES = ["size", "capacity", "allocated", "free", "fragmentation", "freeing"]
+
+
+def placeholder_properties():
+    """Return properties shown until pool is loaded"""
+    properties = {key: "0" if key in NUMERIC_PROPERTIES else "loading" for key in PROPERTIES}
+    properties["checkpoint"] = "-"
+    properties["metaslabs"] = "unknown"
+    return properties
+
+
 # pylint: disable=too-many-instance-attributes
 class Zpool:
-    """Class representing zfs pool"""
+    """Class representing zfs pool
+
+    Constructor doesn't run any zfs command, pool has only placeholder
+    properties and root dataset until load() is called.
+    """
 
-    def __init__(self, name):
+    def __init__(self, name, loop):
         self.name = name
-        self.init_datasets()
-        self.get_properties()
+        self.loaded = False
+        self.property = placeholder_properties()
+        self.datasets = {}
+        self.objset_index = {}
+        self.datasets[name] = dataset_lib.Dataset(name, dataset_lib.placeholder_properties())
+        self.dataset_io = dataset_io.PoolDatasetIO(self.name, self.objset_index, loop)
         self.frag_hist = "... Collecting Data ...\n".splitlines()
-        self.get_fragmentation()
-        self.event_log = event_log.EventLog(name)
+        self.event_log = event_log.EventLog(name, loop)
         self.pool_io = zpool_io.PoolIO(name)
         self.zpool_io_watcher = zpool_io.ZpoolWatcher(
             self.name, self.pool_io.device, self.pool_io.raids, self.pool_io
         )
-        self.txgs = txgs.Txgs(self.name)
-        self.read_stats = reads_stats_lib.PoolReadsStats(self.name, self.datasets)
+        self.txgs = txgs.Txgs(self.name, loop)
+        self.read_stats = reads_stats_lib.PoolReadsStats(
+            self.name, self.datasets, self.objset_index, loop
+        )
+
+    def load(self, loop):
+        """Read properties, datasets and topology of pool, runs in loader thread"""
+        self.get_properties()
+        self.init_datasets()
+        self.pool_io.read_topology()
+        self.zpool_io_watcher.init_smart(loop)
+        self.get_fragmentation(loop)
+        self.loaded = True
 
     def init_datasets(self):
-        """Create class for child datasets"""
-        self.datasets = {}
-        try:
-            output = subprocess.run(
-                ["zfs", "list", "-rHo", "name", self.name],
-                stdout=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-        except subprocess.CalledProcessError:
-            return
-        for line in output.stdout.splitlines():
-            self.datasets[line] = dataset_lib.Dataset(line)
+        """Create class for child datasets, placeholder root dataset is reused"""
+        for name, properties in dataset_lib.read_properties([self.name]).items():
+            dataset = self.datasets.get(name)
+            if dataset is None:
+                self.add_dataset(dataset_lib.Dataset(name, properties))
+            else:
+                dataset.set_properties(properties)
+                self.add_dataset(dataset)
+
+    def add_dataset(self, dataset):
+        """Add dataset to pool and to objsetid index"""
+        self.datasets[dataset.name] = dataset
+        self.objset_index[dataset.objset_key()] = dataset
+
+    def remove_dataset(self, name):
+        """Remove dataset from pool and from objsetid index"""
+        dataset = self.datasets.pop(name)
+        if self.objset_index.get(dataset.objset_key()) is dataset:
+            del self.objset_index[dataset.objset_key()]
+        history_store.drop("dataset." + name)
+
+    def close(self, loop):
+        """Stop collectors of pool which no longer exists"""
+        loop.cancel(self.dataset_io.timer)
+        loop.cancel(self.event_log.process)
+        loop.cancel(self.txgs.timer)
+        loop.cancel(self.read_stats.timer)
+
+    def drop_history(self):
+        """Remove stored history of pool which no longer exists"""
+        for name in list(self.datasets):
+            history_store.drop("dataset." + name)
+        history_store.drop("pool." + self.name + ".io")
+        history_store.drop("pool." + self.name + ".txg")
+
+    def update_datasets(self, objsetids):
+        """Diff datasets against listed {name: objsetid}, return changed names
+
+        Datasets which are gone or were recreated with new objsetid are
+        removed, new ones are read with one zfs call. Unchanged datasets keep
+        their collected IO.
+        """
+        removed = [
+            name
+            for name, dataset in self.datasets.items()
+            if objsetids.get(name) != dataset.property["objsetid"]
+        ]
+        for name in removed:
+            self.remove_dataset(name)
+        added = [name for name in objsetids if name not in self.datasets]
+        if not added:
+            return removed
+        for name, properties in dataset_lib.read_properties(added, recursive=False).items():
+            self.add_dataset(dataset_lib.Dataset(name, properties))
+        # keep zfs order of datasets, root dataset is always first, UI threads
+        # read datasets while they are reordered, so new dict replaces old one
+        datasets = {}
+        if self.name in self.datasets:
+            datasets[self.name] = self.datasets[self.name]
+        for name in objsetids:
+            if name in self.datasets:
+                datasets[name] = self.datasets[name]
+        self.datasets = datasets
+        self.read_stats.datasets = datasets
+        return removed + added
 
-    def get_fragmentation(self):
-        """Call zdb in new thread to read fragmentation histogram"""
-        threading.Thread(target=self.get_fragmentation_async, daemon=True, name="zdb").start()
+    def get_fragmentation(self, loop):
+        """Run zdb in collector loop to read fragmentation histogram"""
+        loop.run_command(["zdb", "-LM", self.name], self.get_fragmentation_async)
 
-    def get_fragmentation_async(self):
+    def get_fragmentation_async(self, returncode, output, error):
         """Parse zdb histogram output"""
-        try:
-            proc_out = subprocess.run(
-                ["zdb", "-LM", self.name],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-            output = proc_out.stdout
-        except subprocess.CalledProcessError as exception:
+        if returncode != 0:
             self.frag_hist = "ZDB error:\n".splitlines()
-            self.frag_hist.append(exception.stderr)
+            self.frag_hist.append(error)
             return
         match_vdev = re.compile(r"metaslabs.*\tpool", re.DOTALL)
         self.frag_hist = (
@@ -76,22 +162,9 @@ class Zpool:
 
     def get_properties(self):
         """Read zpool properties"""
-        properties = [
-            "health",
-            "size",
-            "capacity",
-            "dedupratio",
-            "allocated",
-            "free",
-            "fragmentation",
-            "autotrim",
-            "freeing",
-            "checkpoint",
-            "readonly",
-        ]
         try:
             output = subprocess.run(
-                ["zpool", "get", "-Hpo", "value", ",".join(properties), self.name],
+                ["zpool", "get", "-Hpo", "value", ",".join(PROPERTIES), self.name],
                 stdout=subprocess.PIPE,
                 text=True,
                 check=True,
@@ -99,11 +172,12 @@ class Zpool:
         except subprocess.CalledProcessError:
             return
         i = 0
-        self.property = {}
+        properties = {}
         for line in output.stdout.splitlines():
-            self.property[properties[i]] = line
+            properties[PROPERTIES[i]] = line
             i += 1
-        self.property["metaslabs"] = "unknown"
+        properties["metaslabs"] = "unknown"
+        self.property = properties
 
     def get_datasets(self):
         """Return list of all pool datasets"""
@@ -112,10 +186,11 @@ class Zpool:
         return datasets
 
     def get_dataset_by_id(self, dataset_id):
-        """Return dataset by id"""
-        for dataset in self.datasets.values():
-            if int(dataset.property["objsetid"]) == int(dataset_id, 16):
-                return dataset
+        """Return dataset by id in hex format used by kstats"""
+        try:
+            return self.objset_index[dataset_id]
+        except KeyError:
+            pass
         if dataset_id == "0x0":
             return self.datasets[self.name]
         return None